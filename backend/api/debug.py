@@ -0,0 +1,53 @@
+"""
+Debug API endpoints
+On-demand profiling of the live server
+Only mounted when DEBUG_PROFILING is enabled
+"""
+
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+
+from backend.core.config import settings
+from backend.core.profiling import collapsed_profile, loop_lag_monitor, sample_stacks
+
+router = APIRouter()
+
+
+def _check_token(token: Optional[str]):
+    """Require the configured debug token"""
+    if not settings.DEBUG_TOKEN:
+        raise HTTPException(status_code=403, detail="DEBUG_TOKEN is not configured")
+
+    if not token or not secrets.compare_digest(token, settings.DEBUG_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid debug token")
+
+
+@router.get("/debug/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(5.0, gt=0, le=60),
+    x_debug_token: Optional[str] = Header(None)
+):
+    """
+    Sample all threads for N seconds
+    Returns collapsed stacks for flamegraph.pl, speedscope or inferno
+    """
+    _check_token(x_debug_token)
+
+    # Sample from a worker thread so the loop keeps running (and shows up)
+    samples = await run_in_threadpool(sample_stacks, seconds)
+
+    return PlainTextResponse(collapsed_profile(samples))
+
+
+@router.get("/debug/loop")
+async def loop_stats(x_debug_token: Optional[str] = Header(None)):
+    """
+    Event-loop lag statistics and the stack of the last stall
+    """
+    _check_token(x_debug_token)
+
+    return loop_lag_monitor.stats()
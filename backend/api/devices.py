@@ -3,13 +3,28 @@ Devices API endpoints
 Handle device discovery and management
 """
 
-from fastapi import APIRouter, HTTPException
+import json
+import uuid
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
+from backend.core.config import settings
+from backend.core.pagination import NDJSON_MEDIA_TYPE, ndjson_lines, paginate, parse_fields, project
+from backend.core.responses import etag_matches
 from backend.core.websocket_manager import ws_manager
 
 router = APIRouter()
 
+# Distinguishes registry revisions of this process from a previous run
+_INSTANCE_ID = uuid.uuid4().hex[:8]
+
+# Serialized listings of the current registry revision:
+# {(endpoint, params...): (body, extra headers)}
+_response_cache: Dict[tuple, Tuple[bytes, Dict[str, str]]] = {}
+_response_cache_revision = -1
+_RESPONSE_CACHE_MAX = 256
+
 
 class DeviceInfo(BaseModel):
     """Device information model"""
@@ -26,31 +41,118 @@ class DeviceUpdateRequest(BaseModel):
     mode: Optional[str] = None
 
 
+def _registry_etag() -> str:
+    return f'"{_INSTANCE_ID}-{ws_manager.revision}"'
+
+
+def _cached_json(
+    key: tuple,
+    build: Callable[[], Tuple[object, Optional[Dict[str, str]]]],
+    if_none_match: Optional[str],
+    cacheable: bool = True
+) -> Response:
+    """
+    Serve a device listing from the cache of the current registry revision
+    `build` returns (content, extra headers) and only runs on a cache miss.
+    Clients that send the current ETag get 304 Not Modified.
+    Pages that hand out cursors are not cacheable: each cursor points into
+    its own key snapshot, which may be evicted while the page is cached.
+    """
+    global _response_cache_revision
+    
+    etag = _registry_etag()
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    # Any registry change invalidates every cached listing
+    if _response_cache_revision != ws_manager.revision:
+        _response_cache.clear()
+        _response_cache_revision = ws_manager.revision
+    
+    cached = _response_cache.get(key) if cacheable else None
+    if cached is None:
+        content, headers = build()
+        body = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        cached = (body, headers or {})
+        
+        if cacheable:
+            if len(_response_cache) >= _RESPONSE_CACHE_MAX:
+                # Drop the oldest entry (dicts keep insertion order)
+                _response_cache.pop(next(iter(_response_cache)))
+            _response_cache[key] = cached
+    
+    body, headers = cached
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={**headers, "ETag": etag, "Cache-Control": "no-cache"}
+    )
+
+
 @router.get("/devices", response_model=List[DeviceInfo])
-async def get_devices():
-    """Get list of all connected devices"""
-    devices = [
-        DeviceInfo(**device)
-        for device in ws_manager.devices.values()
-    ]
-    return devices
+async def get_devices(
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=settings.LIST_MAX_PAGE_SIZE),
+    mode: Optional[str] = None,
+    device_type: Optional[str] = Query(None, alias="deviceType"),
+    fields: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Get list of connected devices
+    Optionally paginated (limit/cursor, next cursor in the X-Next-Cursor
+    header), filtered by mode and device type, and projected to the
+    requested fields. format=ndjson streams the full list.
+    Responses carry the registry ETag; send it as If-None-Match to get
+    304 Not Modified until a device changes.
+    """
+    # Filters are answered from the registry's mode / device type indexes
+    devices = ws_manager.devices_where(mode, device_type)
+    field_list = parse_fields(fields)
+    
+    if format == "ndjson":
+        etag = _registry_etag()
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        return StreamingResponse(
+            ndjson_lines(list(devices.values()), field_list),
+            media_type=NDJSON_MEDIA_TYPE,
+            headers={"ETag": etag, "Cache-Control": "no-cache"}
+        )
+    
+    def build():
+        # Registry entries already have the DeviceInfo shape - serialize them directly
+        page, next_cursor = paginate(devices, cursor, limit)
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+        return [project(device, field_list) for device in page], headers
+    
+    return _cached_json(
+        ("devices", cursor, limit, mode, device_type, fields),
+        build,
+        if_none_match,
+        cacheable=limit is None
+    )
+
+
+@router.get("/devices/receivers", response_model=List[DeviceInfo])
+async def get_receivers(if_none_match: Optional[str] = Header(None)):
+    """Get list of devices in RECEIVE mode"""
+    return _cached_json(
+        ("receivers",),
+        lambda: (list(ws_manager.devices_where(mode="RECEIVE").values()), None),
+        if_none_match
+    )
 
 
 @router.get("/devices/{device_id}", response_model=DeviceInfo)
-async def get_device(device_id: str):
+async def get_device(device_id: str, if_none_match: Optional[str] = Header(None)):
     """Get specific device information"""
     if device_id not in ws_manager.devices:
         raise HTTPException(status_code=404, detail="Device not found")
     
-    return DeviceInfo(**ws_manager.devices[device_id])
-
-
-@router.get("/devices/receivers")
-async def get_receivers():
-    """Get list of devices in RECEIVE mode"""
-    receivers = [
-        DeviceInfo(**device)
-        for device in ws_manager.devices.values()
-        if device.get("mode") == "RECEIVE"
-    ]
-    return receivers
+    return _cached_json(
+        ("device", device_id),
+        lambda: (ws_manager.devices[device_id], None),
+        if_none_match
+    )
@@ -3,18 +3,26 @@ Files API endpoints
 Handle file upload, download, and transfer management
 """
 
-import os
+import asyncio
 import uuid
-import shutil
-import aiofiles
-from pathlib import Path
 from typing import List, Optional
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form, BackgroundTasks
-from fastapi.responses import FileResponse, StreamingResponse
+from urllib.parse import parse_qs
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, BackgroundTasks, Header, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel
 
 from backend.core.config import settings
+from backend.core.pagination import NDJSON_MEDIA_TYPE, ndjson_lines, paginate, parse_fields, project
+from backend.core.responses import FileRangeResponse, parse_range_header
+from backend.core.throughput import throughput_tracker
 from backend.core.websocket_manager import ws_manager
+from backend.services.scheduler import transfer_scheduler
+from backend.services.segments import (
+    build_manifest, file_etag, resolve_segment_size, segment_bounds
+)
+from backend.services.storage import StoredFile, storage, validate_transfer_id
+from backend.services.sync import sync_registry
 
 router = APIRouter()
 
@@ -37,53 +45,453 @@ class TransferRequest(BaseModel):
     files: List[dict]
 
 
+class SyncFileEntry(BaseModel):
+    """A file of a folder being re-sent"""
+    path: str
+    size: int
+    mtime: Optional[float] = None  # Any unit, as long as the sender is consistent
+    hash: Optional[str] = None
+
+
+class SyncDiffRequest(BaseModel):
+    """File list of a folder, compared before uploading it"""
+    senderId: str
+    receiverId: str
+    folder: str
+    files: List[SyncFileEntry]
+
+
 # In-memory storage for transfer metadata
 transfers_db = {}
 files_db = {}
 
+# Receiver-facing file list of each transfer, kept up to date as uploads
+# complete: {transfer_id: {"files": {path: {name, path, size}}, "totalSize": int}}
+transfer_manifests = {}
+
+# Paths the receiver has downloaded so far: {transfer_id: set(path)}
+transfer_downloads = {}
+
+# Byte ranges served by /files/segment for files not yet complete:
+# {transfer_id: {path: [(start, end), ...]}}
+segment_progress = {}
+
+# Transfers whose files are being deleted (or kept as a sync snapshot)
+_removing = set()
+
+
+def _record_manifest_entry(transfer_id: str, path: str, name: str, size: int) -> dict:
+    """
+    Add (or replace, for a re-uploaded path) a file in the transfer manifest
+    """
+    manifest = transfer_manifests.setdefault(transfer_id, {"files": {}, "totalSize": 0})
+    
+    previous = manifest["files"].get(path)
+    if previous is not None:
+        manifest["totalSize"] -= previous["size"]
+    
+    entry = {"name": name, "path": path, "size": size}
+    manifest["files"][path] = entry
+    manifest["totalSize"] += size
+    
+    # A queued transfer is ranked by at least what has been uploaded
+    transfer_scheduler.update_size(transfer_id, manifest["totalSize"])
+    
+    return entry
+
+
+async def _announce_file(transfer_id: str, entry: dict) -> None:
+    """
+    Tell an accepted receiver that a file can be downloaded now
+    Lets receivers of progressive transfers start before the upload ends
+    """
+    transfer = transfers_db.get(transfer_id)
+    
+    if transfer and transfer.get("status") == "accepted" and transfer.get("receiverId"):
+        await ws_manager.send_personal_message(transfer["receiverId"], {
+            "type": "file_available",
+            "transferId": transfer_id,
+            "file": entry
+        })
+
+
+def _transfer_done(transfer_id: str) -> bool:
+    """
+    Whether the transfer can be cleaned up: the sender has finished
+    uploading and the receiver has downloaded every file
+    """
+    manifest = transfer_manifests.get(transfer_id)
+    if manifest is None:
+        # Not initiated through a manifest - clean up after any download
+        return True
+    
+    transfer = transfers_db.get(transfer_id, {})
+    if not transfer.get("uploadComplete", True):
+        return False
+    
+    return manifest["files"].keys() <= transfer_downloads.get(transfer_id, set())
+
+
+async def _request_transfer(transfer_id: str) -> None:
+    """
+    Ask the receiver to accept a transfer
+    Lists the files finalized so far; progressive transfers announce the
+    rest as they are uploaded. fileCount and totalSize cover the whole
+    transfer as declared by the sender, so the receiver knows what it is
+    accepting before anything is uploaded.
+    """
+    transfer = transfers_db[transfer_id]
+    manifest = transfer_manifests.get(transfer_id, {"files": {}})
+    
+    await ws_manager.send_personal_message(transfer["receiverId"], {
+        "type": "transfer_request",
+        "transferId": transfer_id,
+        "from": transfer["senderId"],
+        "files": list(manifest["files"].values()),
+        "fileCount": max(transfer.get("fileCount", 0), len(manifest["files"])),
+        "totalSize": transfer.get("totalSize", 0),
+        "progressive": transfer.get("progressive", False)
+    })
+
+
+async def _report_queue(receiver_id: str) -> None:
+    """
+    Send every waiting transfer of a receiver its queue position
+    Both the sender and the receiver get a transfer_queued message
+    """
+    queue = transfer_scheduler.queue(receiver_id)
+    
+    for position, entry in enumerate(queue, start=1):
+        message = {
+            "type": "transfer_queued",
+            "transferId": entry.transfer_id,
+            "position": position,
+            "queueLength": len(queue),
+            "totalSize": entry.size
+        }
+        await ws_manager.send_personal_message(entry.sender_id, message)
+        await ws_manager.send_personal_message(receiver_id, message)
+
+
+async def _start_queued(admitted: list) -> None:
+    """
+    Start transfers the scheduler admitted from the queue
+    """
+    for entry in admitted:
+        transfer = transfers_db.get(entry.transfer_id)
+        if transfer is None:
+            transfer_scheduler.finish(entry.transfer_id)
+            continue
+        
+        transfer["status"] = "pending"
+        await ws_manager.send_personal_message(entry.sender_id, {
+            "type": "transfer_started",
+            "transferId": entry.transfer_id
+        })
+        await _request_transfer(entry.transfer_id)
+
+
+async def _release_transfer(transfer_id: str) -> None:
+    """
+    Free a transfer's slot in its receiver's queue and start the next one
+    """
+    entry = transfer_scheduler.get(transfer_id)
+    if entry is None:
+        return
+    
+    await _start_queued(transfer_scheduler.finish(transfer_id))
+    await _report_queue(entry.receiver_id)
+
+
+def _require_admitted(transfer_id: str) -> None:
+    """
+    Refuse to serve a transfer that is still waiting in the queue
+    Counts as activity for an admitted transfer
+    """
+    position = transfer_scheduler.position(transfer_id)
+    if position is not None:
+        raise HTTPException(status_code=409, detail=f"Transfer is queued (position {position})")
+    
+    transfer_scheduler.touch(transfer_id)
+
+
+async def _on_presence(client_id: str, online: bool) -> None:
+    """
+    Give back the slots of a receiver that went offline, and fill them
+    again when it reconnects
+    """
+    if online:
+        await _start_queued(transfer_scheduler.admit(client_id))
+        await _report_queue(client_id)
+        return
+    
+    released = transfer_scheduler.release_receiver(client_id)
+    if released:
+        print(f"⏏️  Released {len(released)} transfer slot(s) of offline receiver {client_id}")
+
+
+ws_manager.add_presence_listener(_on_presence)
+
+
+async def monitor_idle_transfers() -> None:
+    """
+    Free the slots of admitted transfers that stopped moving (sender never
+    completed, download failed, ...) so they cannot block the queue
+    Runs for the lifetime of the server
+    """
+    timeout = settings.TRANSFER_IDLE_TIMEOUT
+    
+    while True:
+        await asyncio.sleep(max(timeout / 4, 1.0))
+        
+        for entry in transfer_scheduler.idle(timeout):
+            print(f"⏱️  Transfer {entry.transfer_id} idle for {timeout:.0f}s - freeing its slot")
+            await _release_transfer(entry.transfer_id)
+
+
+def _activity_transfer_id(scope) -> Optional[str]:
+    """
+    Transfer an upload or download request belongs to
+    Downloads carry it in the path; uploads only in the multipart body, so
+    clients repeat it in the query string (?transfer_id=...)
+    """
+    parts = scope["path"].split("/")
+    if scope["path"].startswith(("/api/files/download/", "/api/files/segment/")) and len(parts) > 5:
+        return parts[4]
+    if scope["path"] in ("/api/files/upload", "/api/files/upload-multiple"):
+        values = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("transfer_id")
+        return values[0] if values else None
+    return None
+
+
+class TransferActivityMiddleware:
+    """
+    ASGI middleware that keeps the scheduler informed of moving bytes
+    Every body chunk received or sent counts as activity, so a single long
+    upload or download is never taken for idle, and requests in flight
+    keep the transfer's slot when the receiver briefly goes offline.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        transfer_id = _activity_transfer_id(scope) if scope["type"] == "http" else None
+        if transfer_id is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def tracking_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                transfer_scheduler.touch(transfer_id)
+            return message
+
+        async def tracking_send(message):
+            await send(message)
+            if message["type"] == "http.response.body":
+                transfer_scheduler.touch(transfer_id)
+
+        transfer_scheduler.open_request(transfer_id)
+        try:
+            await self.app(scope, tracking_receive, tracking_send)
+        finally:
+            if transfer_scheduler.close_request(transfer_id):
+                print(f"⏏️  Released transfer slot of {transfer_id} - its receiver is offline")
+
+
+def _remove_transfer(transfer_id: str, delivered: bool = False) -> None:
+    """
+    Delete a transfer's files and forget it
+    A delivered transfer that re-sent a synced folder is kept as the
+    folder's snapshot instead of being deleted. Blocking - use _remove.
+    """
+    manifest = transfer_manifests.get(transfer_id, {"files": {}})
+    sizes = {path: entry["size"] for path, entry in manifest["files"].items()}
+    
+    if not (delivered and sync_registry.promote(transfer_id, sizes)):
+        sync_registry.discard(transfer_id)
+        storage.delete_transfer(transfer_id)
+    
+    transfers_db.pop(transfer_id, None)
+    transfer_manifests.pop(transfer_id, None)
+    transfer_downloads.pop(transfer_id, None)
+    segment_progress.pop(transfer_id, None)
+
+
+async def _remove(transfer_id: str, delivered: bool = False) -> bool:
+    """
+    Run _remove_transfer in a worker thread, once per transfer
+    Callers racing to remove the same transfer (downloads finishing
+    together, a DELETE during the last download) find the marker, set
+    before the first await, and back off.
+    
+    Returns:
+        False if the transfer was already being removed
+    """
+    if transfer_id in _removing:
+        return False
+    _removing.add(transfer_id)
+    
+    try:
+        await run_in_threadpool(_remove_transfer, transfer_id, delivered)
+    finally:
+        _removing.discard(transfer_id)
+    
+    return True
+
+
+async def _remove_delivered(transfer_id: str) -> None:
+    """
+    Delete a transfer the receiver has downloaded completely and free its
+    queue slot
+    """
+    if not await _remove(transfer_id, delivered=True):
+        return
+    print(f"🗑️  Auto-deleted transfer directory: {transfer_id}")
+    
+    # Let the receiver's next queued transfer start
+    await _release_transfer(transfer_id)
+
+
+async def _mark_downloaded(transfer_id: str, path: str) -> None:
+    """
+    Record that the receiver has a file, and clean the transfer up once
+    it has all of them
+    """
+    try:
+        transfer_downloads.setdefault(transfer_id, set()).add(path)
+        transfer_scheduler.touch(transfer_id)
+        
+        # Other files are still pending (or still uploading)
+        if not _transfer_done(transfer_id):
+            return
+        
+        # Delete the entire transfer directory after download
+        await _remove_delivered(transfer_id)
+    except Exception as e:
+        print(f"Cleanup error for {transfer_id}: {e}")
+
+
+async def _record_segment(transfer_id: str, path: str, size: int, start: int, end: int) -> None:
+    """
+    Count a served segment; a file whose segments cover every byte counts
+    as downloaded, the same as a full download
+    """
+    files = segment_progress.setdefault(transfer_id, {})
+    
+    # Keep the ranges merged so retried or overlapping segments are not counted twice
+    merged = []
+    for range_start, range_end in sorted(files.get(path, []) + [(start, end)]):
+        if merged and range_start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], range_end))
+        else:
+            merged.append((range_start, range_end))
+    
+    if merged != [(0, size - 1)]:
+        files[path] = merged
+        return
+    
+    files.pop(path, None)
+    if not files:
+        segment_progress.pop(transfer_id, None)
+    await _mark_downloaded(transfer_id, path)
+
+
+def _scan_transfer(transfer_id: str) -> Optional[dict]:
+    """
+    Rebuild a manifest from the storage backend
+    Recovery fallback for transfers without a recorded manifest (e.g. files
+    placed there before a restart). Blocking - call from a worker thread.
+    """
+    stored_files = storage.scan(transfer_id)
+    if stored_files is None:
+        return None
+    
+    manifest = {"files": {}, "totalSize": 0}
+    
+    for stored in stored_files:
+        manifest["files"][stored.path] = {
+            "name": stored.name,
+            "path": stored.path,
+            "size": stored.size
+        }
+        manifest["totalSize"] += stored.size
+    
+    return manifest
+
+
+def _get_stored_file(transfer_id: str, file_path: str) -> StoredFile:
+    """
+    Look up a file of a transfer
+    Raises 403 if the path escapes the transfer, 404 if it does not exist
+    """
+    try:
+        stored = storage.get(transfer_id, file_path)
+    except (OSError, ValueError):
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    if stored is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    return stored
+
+
+def _declared_size(file: UploadFile, file_size: Optional[int]) -> Optional[int]:
+    """
+    Size announced by the client, checked against MAX_FILE_SIZE
+    """
+    declared = file_size if file_size is not None else getattr(file, "size", None)
+    
+    if declared is not None and declared > settings.MAX_FILE_SIZE:
+        raise HTTPException(status_code=413, detail=f"File {file.filename} exceeds maximum size")
+    
+    return declared
+
+
+def _client_host(request: Request) -> Optional[str]:
+    return request.client.host if request.client else None
+
 
 @router.post("/files/upload")
 async def upload_file(
     file: UploadFile = File(...),
     sender_id: str = Form(...),
     transfer_id: str = Form(...),
-    relative_path: Optional[str] = Form(None)
+    relative_path: Optional[str] = Form(None),
+    file_size: Optional[int] = Form(None)
 ):
     """
     Upload a file
-    Supports chunked uploads and folder structures
+    Supports chunked uploads and folder structures.
+    On disk the file is written to a temp name (preallocated to file_size
+    when given) and renamed into place only once it is complete.
     """
+    declared_size = _declared_size(file, file_size)
+    
     try:
         # Generate unique file ID
         file_id = str(uuid.uuid4())
         
-        # Determine file path (support folder structures)
-        if relative_path:
-            # Create folder structure
-            file_path = Path(settings.UPLOAD_DIR) / transfer_id / relative_path
-            file_path.parent.mkdir(parents=True, exist_ok=True)
-        else:
-            # Single file
-            transfer_dir = Path(settings.UPLOAD_DIR) / transfer_id
-            transfer_dir.mkdir(parents=True, exist_ok=True)
-            file_path = transfer_dir / file.filename
-        
-        # Save file with async I/O
-        async with aiofiles.open(file_path, 'wb') as f:
-            content = await file.read()
-            await f.write(content)
+        # Store the file (support folder structures)
+        try:
+            stored = await storage.save(
+                transfer_id, relative_path or file.filename, file, declared_size
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        file_size = stored.size
         
         # Store file metadata
-        file_size = os.path.getsize(file_path)
         file_metadata = {
             "id": file_id,
             "name": file.filename,
             "size": file_size,
             "type": file.content_type or "application/octet-stream",
-            "path": relative_path or file.filename,
+            "path": stored.path,
             "uploadedBy": sender_id,
             "transferId": transfer_id,
-            "filePath": str(file_path)
+            "filePath": stored.location(transfer_id)
         }
         
         files_db[file_id] = file_metadata
@@ -102,6 +510,10 @@ async def upload_file(
         transfers_db[transfer_id]["totalSize"] += file_size
         transfers_db[transfer_id]["uploadedSize"] += file_size
         
+        entry = _record_manifest_entry(transfer_id, file_metadata["path"], file.filename, file_size)
+        transfer_scheduler.touch(transfer_id)
+        await _announce_file(transfer_id, entry)
+        
         return {
             "success": True,
             "fileId": file_id,
@@ -109,6 +521,8 @@ async def upload_file(
             "message": f"File {file.filename} uploaded successfully"
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
@@ -127,15 +541,12 @@ async def upload_multiple_files(
     for file in files:
         try:
             file_id = str(uuid.uuid4())
-            transfer_dir = Path(settings.UPLOAD_DIR) / transfer_id
-            transfer_dir.mkdir(parents=True, exist_ok=True)
-            file_path = transfer_dir / file.filename
             
-            async with aiofiles.open(file_path, 'wb') as f:
-                content = await file.read()
-                await f.write(content)
+            stored = await storage.save(
+                transfer_id, file.filename, file, _declared_size(file, None)
+            )
+            file_size = stored.size
             
-            file_size = os.path.getsize(file_path)
             file_metadata = {
                 "id": file_id,
                 "name": file.filename,
@@ -143,14 +554,17 @@ async def upload_multiple_files(
                 "type": file.content_type or "application/octet-stream",
                 "uploadedBy": sender_id,
                 "transferId": transfer_id,
-                "filePath": str(file_path)
+                "filePath": stored.location(transfer_id)
             }
             
             files_db[file_id] = file_metadata
+            entry = _record_manifest_entry(transfer_id, stored.path, file.filename, file_size)
+            transfer_scheduler.touch(transfer_id)
+            await _announce_file(transfer_id, entry)
             results.append({"fileId": file_id, "name": file.filename, "success": True})
         
         except Exception as e:
-            results.append({"name": file.filename, "success": False, "error": str(e)})
+            results.append({"name": file.filename, "success": False, "error": getattr(e, "detail", str(e))})
     
     return {
         "success": True,
@@ -178,53 +592,160 @@ async def download_transfer(transfer_id: str):
 
 
 @router.get("/files/download/{transfer_id}/{file_path:path}")
-async def download_single_file(transfer_id: str, file_path: str, background_tasks: BackgroundTasks):
+async def download_single_file(
+    request: Request,
+    transfer_id: str,
+    file_path: str,
+    background_tasks: BackgroundTasks
+):
     """
     Download a single file from a transfer (supports nested paths)
-    File and transfer directory will be deleted after successful download
+    The transfer directory is deleted once every file of the transfer has
+    been downloaded and the sender has finished uploading
     """
-    transfer_dir = Path(settings.UPLOAD_DIR) / transfer_id
-    full_file_path = transfer_dir / file_path
+    _require_admitted(transfer_id)
     
-    # Security: Ensure the file is within the transfer directory
-    try:
-        full_file_path = full_file_path.resolve()
-        transfer_dir = transfer_dir.resolve()
-        if not str(full_file_path).startswith(str(transfer_dir)):
-            raise HTTPException(status_code=403, detail="Access denied")
-    except:
-        raise HTTPException(status_code=403, detail="Invalid file path")
-    
-    if not full_file_path.exists() or not full_file_path.is_file():
-        raise HTTPException(status_code=404, detail="File not found")
+    # Security: Ensure the file is within the transfer
+    stored = _get_stored_file(transfer_id, file_path)
     
     # Get original filename
-    filename = full_file_path.name
+    filename = stored.name
     
     # Schedule cleanup after download completes
-    def cleanup_after_download():
-        try:
-            # Delete the entire transfer directory after download
-            if transfer_dir.exists():
-                shutil.rmtree(transfer_dir)
-                print(f"🗑️  Auto-deleted transfer directory: {transfer_id}")
-            
-            # Remove from database
-            if transfer_id in transfers_db:
-                del transfers_db[transfer_id]
-        except Exception as e:
-            print(f"Cleanup error for {transfer_id}: {e}")
+    background_tasks.add_task(_mark_downloaded, transfer_id, stored.path)
+    
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Accept-Ranges": "bytes"
+    }
     
-    background_tasks.add_task(cleanup_after_download)
+    if stored.in_memory:
+        return Response(
+            content=stored.data,
+            media_type="application/octet-stream",
+            headers=headers
+        )
     
-    return FileResponse(
-        full_file_path,
+    response = FileResponse(
+        stored.disk_path,
         media_type="application/octet-stream",
         filename=filename,
-        headers={
-            "Content-Disposition": f'attachment; filename="{filename}"',
-            "Accept-Ranges": "bytes"
-        }
+        headers=headers
+    )
+    # Write in chunks sized for this client's measured link
+    response.chunk_size = throughput_tracker.buffer_size(_client_host(request))
+    
+    return response
+
+
+@router.get("/files/negotiate")
+async def negotiate_transfer(
+    request: Request,
+    client_id: Optional[str] = None,
+    direction: str = Query("download", pattern="^(upload|download)$")
+):
+    """
+    Recommend chunk size and parallelism for the calling client
+    Based on the throughput measured on its previous uploads/downloads and
+    the round-trip time of its WebSocket (pass client_id to pick it).
+    The server sizes its own read/write buffers for the client the same way.
+    """
+    return throughput_tracker.recommend(_client_host(request), client_id, direction)
+
+
+@router.get("/files/manifest/{transfer_id}")
+async def get_download_manifest(
+    transfer_id: str,
+    checksums: bool = False,
+    segment_size: Optional[int] = None
+):
+    """
+    Get the segmented download manifest of a transfer
+    Lists every file with its size, validators and segment boundaries so
+    clients can fetch segments in parallel from /files/segment
+    """
+    try:
+        # Walking and hashing is blocking I/O - keep it off the event loop
+        stored_files = await run_in_threadpool(storage.scan, transfer_id)
+    except ValueError:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    if stored_files is None:
+        raise HTTPException(status_code=404, detail="Transfer not found")
+    
+    manifest = await run_in_threadpool(
+        build_manifest, transfer_id, stored_files, resolve_segment_size(segment_size), checksums
+    )
+    manifest["transferId"] = transfer_id
+    
+    return manifest
+
+
+@router.get("/files/segment/{transfer_id}/{file_path:path}")
+async def download_segment(
+    request: Request,
+    transfer_id: str,
+    file_path: str,
+    background_tasks: BackgroundTasks,
+    index: Optional[int] = None,
+    segment_size: Optional[int] = None,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_match: Optional[str] = Header(None, alias="If-Match")
+):
+    """
+    Download one segment of a file
+    The segment is selected by manifest index or by a standard Range header.
+    Any number of segments can be fetched in parallel; once the served
+    segments cover the whole file it counts as downloaded, and the
+    transfer is cleaned up when every file has been.
+    """
+    _require_admitted(transfer_id)
+    
+    stored = _get_stored_file(transfer_id, file_path)
+    etag = file_etag(stored.size, stored.mtime_ns)
+    
+    # File changed since the client read the manifest
+    if if_match and if_match.strip() not in ("*", etag):
+        raise HTTPException(status_code=412, detail="File has changed")
+    
+    if index is not None:
+        bounds = segment_bounds(stored.size, resolve_segment_size(segment_size))
+        if not 0 <= index < len(bounds):
+            raise HTTPException(status_code=416, detail="Segment index out of range")
+        start, end = bounds[index]
+    elif range_header:
+        byte_range = parse_range_header(range_header, stored.size)
+        if byte_range is None:
+            raise HTTPException(
+                status_code=416,
+                detail="Invalid range",
+                headers={"Content-Range": f"bytes */{stored.size}"}
+            )
+        start, end = byte_range
+    else:
+        raise HTTPException(status_code=400, detail="Segment index or Range header required")
+    
+    background_tasks.add_task(_record_segment, transfer_id, stored.path, stored.size, start, end)
+    
+    if stored.in_memory:
+        return Response(
+            content=stored.data[start:end + 1],
+            status_code=206,
+            media_type="application/octet-stream",
+            headers={
+                "ETag": etag,
+                "Accept-Ranges": "bytes",
+                "Content-Range": f"bytes {start}-{end}/{stored.size}"
+            }
+        )
+    
+    return FileRangeResponse(
+        str(stored.disk_path),
+        start,
+        end,
+        stored.size,
+        chunk_size=throughput_tracker.buffer_size(_client_host(request)),
+        headers={"ETag": etag}
     )
 
 
@@ -239,35 +760,109 @@ async def get_transfer_info(transfer_id: str):
     return transfers_db[transfer_id]
 
 
+@router.post("/transfers/{transfer_id}/diff")
+async def diff_transfer(transfer_id: str, body: SyncDiffRequest):
+    """
+    Compare a folder with the receiver's previous copy before uploading it
+    Files unchanged since the receiver last downloaded this folder from
+    this sender (same size, and same hash - or mtime when no hash is given)
+    are linked into the transfer from the server's snapshot; only the paths
+    listed in "upload" need to be uploaded. The receiver still gets the
+    complete folder.
+    
+    Both devices must be connected, and an existing transfer must be
+    between the same two, so nobody else can learn what a receiver holds.
+    """
+    transfer = transfers_db.get(transfer_id, {})
+    if (
+        transfer.get("senderId", body.senderId) != body.senderId
+        or transfer.get("receiverId", body.receiverId) != body.receiverId
+    ):
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    for device_id in (body.senderId, body.receiverId):
+        if device_id not in ws_manager.active_connections:
+            raise HTTPException(status_code=404, detail=f"Device {device_id} not connected")
+    
+    try:
+        validate_transfer_id(transfer_id)
+        # Prunes expired snapshots, which deletes files
+        diff = await run_in_threadpool(
+            sync_registry.diff,
+            transfer_id, body.senderId, body.receiverId, body.folder,
+            [entry.model_dump() for entry in body.files]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    upload = diff["upload"]
+    reused = []
+    
+    if diff["reuse"]:
+        linked, missing = await run_in_threadpool(
+            sync_registry.link, diff["snapshotId"], transfer_id, diff["reuse"]
+        )
+        # Snapshot files that disappeared have to be uploaded after all
+        upload = sorted(upload + missing)
+        
+        for stored in linked:
+            entry = _record_manifest_entry(transfer_id, stored.path, stored.name, stored.size)
+            await _announce_file(transfer_id, entry)
+            reused.append(entry)
+    
+    return {
+        "transferId": transfer_id,
+        "upload": upload,
+        "reused": [entry["path"] for entry in reused],
+        "reusedSize": sum(entry["size"] for entry in reused),
+        "removed": diff["removed"],
+        "previousCopy": diff["snapshotId"] is not None
+    }
+
+
 @router.post("/transfers/initiate")
 async def initiate_transfer(
     sender_id: str = Form(...),
     receiver_id: str = Form(...),
-    transfer_id: str = Form(...)
+    transfer_id: str = Form(...),
+    progressive: bool = Form(False),
+    total_size: Optional[int] = Form(None),
+    file_count: Optional[int] = Form(None),
+    priority: int = Form(0)
 ):
     """
     Initiate a file transfer between devices
+    The file list comes from the manifest recorded as uploads completed;
+    the upload directory is only scanned when no manifest exists.
+    
+    Progressive transfers may be initiated before (or while) files are
+    uploaded: the receiver is sent a file_available message as each file
+    is finalized, and the sender calls /transfers/{id}/complete when done.
+    Such senders should declare total_size and file_count, which the
+    receiver is shown when asked to accept.
+    
+    Transfers to a receiver that is busy with MAX_ACTIVE_TRANSFERS others
+    are queued (ranked by total_size or priority, depending on the queue
+    policy) and the receiver is only asked once the transfer is admitted.
     """
-    # Get files from upload directory
-    transfer_dir = Path(settings.UPLOAD_DIR) / transfer_id
+    manifest = transfer_manifests.get(transfer_id)
     
-    if not transfer_dir.exists():
-        raise HTTPException(status_code=404, detail="Transfer files not found")
+    if manifest is None and progressive:
+        manifest = transfer_manifests.setdefault(transfer_id, {"files": {}, "totalSize": 0})
+    elif manifest is None:
+        try:
+            manifest = await run_in_threadpool(_scan_transfer, transfer_id)
+        except ValueError:
+            manifest = None
+        
+        if manifest is None:
+            raise HTTPException(status_code=404, detail="Transfer files not found")
+        
+        transfer_manifests[transfer_id] = manifest
     
-    # Collect file information
-    files_info = []
-    total_size = 0
+    files_info = list(manifest["files"].values())
     
-    for file_path in transfer_dir.rglob('*'):
-        if file_path.is_file():
-            relative_path = file_path.relative_to(transfer_dir)
-            file_size = file_path.stat().st_size
-            files_info.append({
-                "name": file_path.name,
-                "path": str(relative_path),
-                "size": file_size
-            })
-            total_size += file_size
+    uploaded_size = manifest["totalSize"]
     
     # Create transfer record
     transfers_db[transfer_id] = {
@@ -276,22 +871,35 @@ async def initiate_transfer(
         "receiverId": receiver_id,
         "files": files_info,
         "status": "pending",
-        "totalSize": total_size,
-        "uploadedSize": 0
+        "totalSize": max(total_size or 0, uploaded_size),
+        "fileCount": max(file_count or 0, len(files_info)),
+        "uploadedSize": uploaded_size,
+        "progressive": progressive,
+        "uploadComplete": not progressive,
+        "priority": priority
     }
     
-    # Notify receiver via WebSocket
-    await ws_manager.send_personal_message(receiver_id, {
-        "type": "transfer_request",
-        "transferId": transfer_id,
-        "from": sender_id,
-        "files": files_info
-    })
+    # Wait for a free slot at the receiver
+    admitted = transfer_scheduler.submit(
+        transfer_id, receiver_id, sender_id,
+        size=transfers_db[transfer_id]["totalSize"], priority=priority
+    )
+    await _start_queued([entry for entry in admitted if entry.transfer_id != transfer_id])
+    
+    position = transfer_scheduler.position(transfer_id)
+    if position is None:
+        # Notify receiver via WebSocket
+        await _request_transfer(transfer_id)
+    else:
+        transfers_db[transfer_id]["status"] = "queued"
+    
+    await _report_queue(receiver_id)
     
     return {
         "success": True,
         "transferId": transfer_id,
-        "message": "Transfer initiated"
+        "message": "Transfer initiated" if position is None else "Transfer queued",
+        "queuePosition": position
     }
 
 
@@ -303,6 +911,8 @@ async def accept_transfer(transfer_id: str, receiver_id: str = Form(...)):
     if transfer_id not in transfers_db:
         raise HTTPException(status_code=404, detail="Transfer not found")
     
+    _require_admitted(transfer_id)
+    
     transfer = transfers_db[transfer_id]
     transfer["status"] = "accepted"
     
@@ -313,7 +923,43 @@ async def accept_transfer(transfer_id: str, receiver_id: str = Form(...)):
         "receiverId": receiver_id
     })
     
-    return {"success": True, "message": "Transfer accepted"}
+    # Files finalized so far - the rest arrive as file_available messages
+    manifest = transfer_manifests.get(transfer_id, {"files": {}})
+    
+    return {
+        "success": True,
+        "message": "Transfer accepted",
+        "files": list(manifest["files"].values()),
+        "uploadComplete": transfer.get("uploadComplete", True)
+    }
+
+
+@router.post("/transfers/{transfer_id}/complete")
+async def complete_upload(transfer_id: str):
+    """
+    Mark the upload of a progressive transfer as finished
+    """
+    if transfer_id not in transfers_db:
+        raise HTTPException(status_code=404, detail="Transfer not found")
+    
+    transfer = transfers_db[transfer_id]
+    transfer["uploadComplete"] = True
+    transfer_scheduler.touch(transfer_id)
+    manifest = transfer_manifests.get(transfer_id, {"files": {}, "totalSize": 0})
+    
+    if transfer.get("receiverId"):
+        await ws_manager.send_personal_message(transfer["receiverId"], {
+            "type": "transfer_upload_complete",
+            "transferId": transfer_id,
+            "fileCount": len(manifest["files"]),
+            "totalSize": manifest["totalSize"]
+        })
+    
+    # The receiver may already have everything
+    if transfer_id in transfer_downloads and _transfer_done(transfer_id):
+        await _remove_delivered(transfer_id)
+    
+    return {"success": True, "message": "Upload complete"}
 
 
 @router.post("/transfers/{transfer_id}/reject")
@@ -333,6 +979,8 @@ async def reject_transfer(transfer_id: str):
         "transferId": transfer_id
     })
     
+    await _release_transfer(transfer_id)
+    
     return {"success": True, "message": "Transfer rejected"}
 
 
@@ -340,21 +988,90 @@ async def reject_transfer(transfer_id: str):
 async def delete_transfer(transfer_id: str):
     """
     Delete a transfer and its files
+    A receiver that was already asked about it gets transfer_cancelled
     """
-    transfer_dir = Path(settings.UPLOAD_DIR) / transfer_id
+    transfer = transfers_db.get(transfer_id, {})
+    
+    try:
+        removed = await _remove(transfer_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    if transfer_dir.exists():
-        shutil.rmtree(transfer_dir)
+    # Already being removed - delivered, or deleted by an earlier request
+    if not removed:
+        return {"success": True, "message": "Transfer already being deleted"}
     
-    if transfer_id in transfers_db:
-        del transfers_db[transfer_id]
+    if transfer.get("receiverId"):
+        await ws_manager.send_personal_message(transfer["receiverId"], {
+            "type": "transfer_cancelled",
+            "transferId": transfer_id
+        })
+    
+    await _release_transfer(transfer_id)
     
     return {"success": True, "message": "Transfer deleted"}
 
 
+def _file_filter(transfer_id: Optional[str], sender_id: Optional[str], file_type: Optional[str]):
+    """
+    Build a predicate for file listing filters
+    A type ending in "/" or "/*" matches the whole family (e.g. image/*)
+    """
+    if not (transfer_id or sender_id or file_type):
+        return None
+    
+    type_prefix = None
+    if file_type and file_type.endswith(("/", "/*")):
+        type_prefix = file_type.rstrip("*")
+    
+    def predicate(entry: dict) -> bool:
+        if transfer_id and entry.get("transferId") != transfer_id:
+            return False
+        if sender_id and entry.get("uploadedBy") != sender_id:
+            return False
+        if file_type:
+            entry_type = entry.get("type", "")
+            if type_prefix is not None:
+                return entry_type.startswith(type_prefix)
+            return entry_type == file_type
+        return True
+    
+    return predicate
+
+
 @router.get("/files/list")
-async def list_files():
+async def list_files(
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=settings.LIST_MAX_PAGE_SIZE),
+    transfer_id: Optional[str] = None,
+    sender_id: Optional[str] = None,
+    file_type: Optional[str] = Query(None, alias="type"),
+    fields: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$")
+):
     """
-    List all uploaded files
+    List uploaded files
+    Returns every file unless limit or cursor is given; pages are then
+    limit (default LIST_PAGE_SIZE) entries long - pass nextCursor back to
+    get the next one. Filterable by transfer, sender and content type.
+    format=ndjson streams every matching entry for bulk export.
     """
-    return {"files": list(files_db.values())}
+    predicate = _file_filter(transfer_id, sender_id, file_type)
+    field_list = parse_fields(fields)
+    
+    if format == "ndjson":
+        # Snapshot so uploads during the export cannot break iteration
+        snapshot = list(files_db.values())
+        if predicate is not None:
+            snapshot = filter(predicate, snapshot)
+        return StreamingResponse(ndjson_lines(snapshot, field_list), media_type=NDJSON_MEDIA_TYPE)
+    
+    if cursor and limit is None:
+        limit = settings.LIST_PAGE_SIZE
+    
+    page, next_cursor = paginate(files_db, cursor, limit, predicate)
+    
+    return {
+        "files": [project(entry, field_list) for entry in page],
+        "nextCursor": next_cursor
+    }
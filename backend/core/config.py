@@ -3,7 +3,7 @@ Configuration settings for WL-Drop backend
 """
 
 import os
-from typing import Optional
+from typing import Literal, Optional
 from pydantic_settings import BaseSettings
 
 
@@ -19,6 +19,65 @@ class Settings(BaseSettings):
     MAX_FILE_SIZE: int = 10 * 1024 * 1024 * 1024  # 10GB
     CHUNK_SIZE: int = 1024 * 1024  # 1MB chunks
     
+    # Adaptive chunking: per-client chunk size is what the measured link
+    # moves in CHUNK_TARGET_MS, within MIN_CHUNK_SIZE..MAX_CHUNK_SIZE
+    CHUNK_TARGET_MS: int = 250
+    MIN_CHUNK_SIZE: int = 64 * 1024  # 64KB
+    MAX_CHUNK_SIZE: int = 8 * 1024 * 1024  # 8MB
+    DEFAULT_PARALLELISM: int = 2  # Streams recommended before anything is measured
+    MAX_PARALLELISM: int = 8
+    THROUGHPUT_MIN_SAMPLE: int = 256 * 1024  # Smaller bodies are too short to time
+    
+    # Upload durability: "none", "finalize" (fsync on completion) or
+    # "periodic" (also fsync every UPLOAD_FSYNC_INTERVAL bytes)
+    UPLOAD_DURABILITY: Literal["none", "finalize", "periodic"] = "none"
+    UPLOAD_FSYNC_INTERVAL: int = 64 * 1024 * 1024  # 64MB
+    
+    # Storage backend: "disk" or "memory" (small files in RAM, rest on disk)
+    STORAGE_BACKEND: Literal["disk", "memory"] = "disk"
+    MEMORY_TIER_THRESHOLD: int = 1024 * 1024  # Files up to 1MB stay in RAM
+    MEMORY_TIER_BUDGET: int = 256 * 1024 * 1024  # 256MB of RAM at most
+    
+    # Transfer queue per receiver: "fifo", "sjf" (smallest first) or
+    # "priority" (sender priority); 0 active transfers disables queueing
+    TRANSFER_QUEUE_POLICY: Literal["fifo", "sjf", "priority"] = "sjf"
+    MAX_ACTIVE_TRANSFERS: int = 2  # Per receiver
+    TRANSFER_QUEUE_MAX_WAIT: float = 300.0  # Seconds before a transfer jumps the policy order
+    TRANSFER_IDLE_TIMEOUT: float = 600.0  # Seconds without uploads/downloads before a slot is freed
+    
+    # Incremental folder sync: the last delivered copy of each synced folder
+    # is kept so re-sends only upload changed files. Off by default: other
+    # transfers are deleted once downloaded, kept copies stay on disk for up
+    # to SYNC_SNAPSHOT_HOURS
+    SYNC_MAX_SNAPSHOTS: int = 0
+    SYNC_SNAPSHOT_HOURS: float = 7 * 24  # Snapshots unused this long are deleted
+    
+    # Segmented downloads (parallel range requests)
+    SEGMENT_SIZE: int = 16 * 1024 * 1024  # 16MB per segment
+    MIN_SEGMENT_SIZE: int = 256 * 1024  # 256KB lower bound for client overrides
+    
+    # Listing endpoints
+    LIST_PAGE_SIZE: int = 500
+    LIST_MAX_PAGE_SIZE: int = 5000
+    
+    # WebSocket
+    WS_BATCH_WINDOW_MS: int = 20  # Flush window for clients connected with ?batch=1
+    WS_QUEUE_MAX: int = 256  # Queued state updates per connection before dropping the oldest
+    WS_CONTROL_QUEUE_MAX: int = 1024  # Queued control messages before the client is dropped
+    
+    # Liveness. Protocol-level ping/pong is handled by uvicorn; application
+    # probes let the server reap clients that stop answering (sleeping phones)
+    WS_PING_INTERVAL: float = 20.0  # Protocol ping interval (seconds)
+    WS_PING_TIMEOUT: float = 20.0  # Protocol pong timeout (seconds)
+    WS_PROBE_INTERVAL: float = 15.0  # Application ping / reap interval (seconds)
+    WS_PROBE_TIMEOUT: float = 45.0  # Evict ping-answering clients silent this long
+    
+    # Diagnostics - nothing is installed unless DEBUG_PROFILING is true
+    DEBUG_PROFILING: bool = False
+    DEBUG_TOKEN: str = ""  # Required in X-Debug-Token for /api/debug/*
+    SLOW_REQUEST_MS: int = 500
+    LOOP_LAG_THRESHOLD_MS: int = 100
+    
     # CORS
     CORS_ORIGINS: list = ["*"]
     
@@ -0,0 +1,207 @@
+"""
+Server launch profiles
+Named uvicorn, event loop and socket settings for run.py, and the
+optional hypercorn (HTTP/2) server mode
+"""
+
+import importlib.util
+import socket
+from typing import Any, Dict, Optional
+
+
+# Profile settings. None means "leave the uvicorn / OS default".
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "default": {
+        "loop": "auto",
+        "http": "auto",
+        "backlog": 2048,
+        "keep_alive": 5,
+        "h11_max_event_size": None,
+        "sndbuf": None,
+        "rcvbuf": None,
+        "limit_concurrency": None,
+    },
+    # Gigabit LAN transfers: fast loop and parser, deep accept queue,
+    # long-lived connections and large socket buffers
+    "throughput": {
+        "loop": "uvloop",
+        "http": "httptools",
+        "backlog": 4096,
+        "keep_alive": 75,
+        "h11_max_event_size": 1024 * 1024,
+        "sndbuf": 4 * 1024 * 1024,
+        "rcvbuf": 4 * 1024 * 1024,
+        "limit_concurrency": None,
+    },
+    # Small hosts (Raspberry Pi, old laptops): pure-Python stack,
+    # small buffers and a cap on concurrent connections
+    "lowmem": {
+        "loop": "asyncio",
+        "http": "h11",
+        "backlog": 128,
+        "keep_alive": 5,
+        "h11_max_event_size": 16 * 1024,
+        "sndbuf": 64 * 1024,
+        "rcvbuf": 64 * 1024,
+        "limit_concurrency": 64,
+    },
+}
+
+
+def parse_size(value: str) -> int:
+    """
+    Parse a byte size such as 65536, 64K, 4M or 1G
+    """
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    value = value.strip().upper().rstrip("B")
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def resolve_loop(requested: str) -> str:
+    """
+    Map a requested event loop to one that is actually available
+    """
+    if requested in ("auto", "uvloop"):
+        return "uvloop" if _installed("uvloop") else "asyncio"
+    return requested
+
+
+def resolve_http(requested: str) -> str:
+    """
+    Map a requested HTTP parser to one that is actually available
+    """
+    if requested in ("auto", "httptools"):
+        return "httptools" if _installed("httptools") else "h11"
+    return requested
+
+
+def resolve_server(requested: str) -> str:
+    """
+    Map a requested server to one that is actually available
+    hypercorn (HTTP/2) is optional - fall back to uvicorn without it
+    """
+    if requested == "hypercorn" and not _installed("hypercorn"):
+        return "uvicorn"
+    return requested
+
+
+def resolve_options(profile: str, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Combine a named profile with explicit command line overrides
+
+    Returns:
+        Options dict with the requested and effective loop / parser
+    """
+    options = dict(PROFILES[profile])
+    for key, value in (overrides or {}).items():
+        if value is not None:
+            options[key] = value
+
+    options["profile"] = profile
+    options["requested_loop"] = options["loop"]
+    options["requested_http"] = options["http"]
+    options["loop"] = resolve_loop(options["loop"])
+    options["http"] = resolve_http(options["http"])
+    options["requested_server"] = options.get("server", "uvicorn")
+    options["server"] = resolve_server(options["requested_server"])
+
+    return options
+
+
+def _apply_buffer_sizes(sock: socket.socket, options: Dict[str, Any]) -> None:
+    # Set before listen() so accepted sockets inherit the sizes and the
+    # receive window can scale to match
+    if options.get("sndbuf"):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, options["sndbuf"])
+    if options.get("rcvbuf"):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, options["rcvbuf"])
+
+
+def create_listen_socket(host: str, port: int, options: Dict[str, Any]) -> socket.socket:
+    """
+    Create the listening socket with the profile's backlog and buffer sizes
+    Raises OSError when the address cannot be bound (e.g. port in use)
+    """
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        _apply_buffer_sizes(sock, options)
+        sock.bind((host, port))
+        sock.listen(options["backlog"])
+    except OSError:
+        sock.close()
+        raise
+    sock.set_inheritable(True)
+    return sock
+
+
+def effective_buffer_sizes(options: Dict[str, Any]) -> tuple:
+    """
+    Socket buffer sizes the kernel actually grants for these options
+    (Linux doubles the requested value and clamps it to net.core.*mem_max)
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        _apply_buffer_sizes(sock, options)
+        return (
+            sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF),
+            sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF),
+        )
+    finally:
+        sock.close()
+
+
+def uvicorn_kwargs(options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Translate launch options into uvicorn.Config keyword arguments
+    """
+    return {
+        "loop": options["loop"],
+        "http": options["http"],
+        "backlog": options["backlog"],
+        "timeout_keep_alive": options["keep_alive"],
+        "h11_max_incomplete_event_size": options["h11_max_event_size"],
+        "limit_concurrency": options["limit_concurrency"],
+    }
+
+
+def hypercorn_config(
+    options: Dict[str, Any],
+    sock: socket.socket,
+    ws_ping_interval: Optional[float] = None,
+    certfile: Optional[str] = None,
+    keyfile: Optional[str] = None
+):
+    """
+    Build a hypercorn Config serving HTTP/2 on the pre-configured socket
+
+    Without a certificate HTTP/2 is offered in cleartext (h2c, prior
+    knowledge or Upgrade); with one it is negotiated through ALPN, which
+    is what browsers require.
+    """
+    from hypercorn.config import Config
+
+    config = Config()
+    config.bind = [f"fd://{sock.fileno()}"]
+    config.backlog = options["backlog"]
+    config.keep_alive_timeout = options["keep_alive"]
+    config.alpn_protocols = ["h2", "http/1.1"]
+    config.websocket_ping_interval = ws_ping_interval
+    config.accesslog = "-"
+
+    if options.get("h2_max_streams"):
+        config.h2_max_concurrent_streams = options["h2_max_streams"]
+    if options.get("h11_max_event_size"):
+        config.h11_max_incomplete_size = options["h11_max_event_size"]
+    if certfile:
+        config.certfile = certfile
+        config.keyfile = keyfile
+
+    return config
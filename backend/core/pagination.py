@@ -0,0 +1,142 @@
+"""
+Listing helpers
+Cursor-based pagination, field projection and NDJSON export over the
+in-memory registries (files_db, ws_manager.devices)
+"""
+
+import base64
+import json
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Lines per chunk written by the NDJSON exporter
+_NDJSON_BATCH = 500
+
+# Keys of registries being paged through, least recently used first:
+# {snapshot_id: [key, ...]}
+_key_snapshots: "OrderedDict[str, List[str]]" = OrderedDict()
+_KEY_SNAPSHOTS_MAX = 64
+
+
+def encode_cursor(snapshot_id: str, position: int) -> str:
+    """
+    Encode an opaque cursor pointing at `position` in a key snapshot
+    """
+    raw = json.dumps([snapshot_id, position], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """
+    Decode a cursor produced by encode_cursor
+    Raises 400 for malformed cursors
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        snapshot_id, position = json.loads(base64.urlsafe_b64decode(padded))
+        return str(snapshot_id), int(position)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _resume(cursor: str) -> Tuple[str, List[str], int]:
+    """
+    Find the key snapshot and position a cursor points at
+    Raises 410 when the snapshot has been evicted - the client has to
+    restart the listing
+    """
+    snapshot_id, position = decode_cursor(cursor)
+
+    keys = _key_snapshots.get(snapshot_id)
+    if keys is None or not 0 <= position <= len(keys):
+        raise HTTPException(status_code=410, detail="Cursor expired, restart the listing")
+
+    _key_snapshots.move_to_end(snapshot_id)
+    return snapshot_id, keys, position
+
+
+def paginate(
+    items: Dict[str, Any],
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    predicate: Optional[Callable[[Any], bool]] = None
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Return one page of values from an insertion-ordered dict
+
+    The first page takes a snapshot of the keys; later pages index into
+    it, so resuming costs nothing however deep the cursor is. Entries
+    removed in the meantime are skipped, entries added after the first
+    page are not part of the listing.
+
+    Args:
+        items: Registry to page through
+        cursor: Cursor returned by the previous page
+        limit: Maximum entries per page (None for no limit)
+        predicate: Optional filter applied before counting entries
+
+    Returns:
+        Tuple of (page, next_cursor). next_cursor is None on the last page.
+    """
+    if cursor:
+        snapshot_id, keys, position = _resume(cursor)
+    else:
+        snapshot_id, keys, position = None, list(items), 0
+
+    page = []
+
+    while position < len(keys) and (limit is None or len(page) < limit):
+        value = items.get(keys[position])
+        position += 1
+        if value is not None and (predicate is None or predicate(value)):
+            page.append(value)
+
+    if position >= len(keys):
+        return page, None
+
+    if snapshot_id is None:
+        snapshot_id = uuid.uuid4().hex
+        _key_snapshots[snapshot_id] = keys
+        if len(_key_snapshots) > _KEY_SNAPSHOTS_MAX:
+            _key_snapshots.popitem(last=False)
+
+    return page, encode_cursor(snapshot_id, position)
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """
+    Parse a comma separated field list (?fields=id,name)
+    """
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(",") if field.strip()]
+
+
+def project(item: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    """
+    Keep only the requested fields of an entry
+    """
+    if fields is None:
+        return item
+    return {field: item[field] for field in fields if field in item}
+
+
+def ndjson_lines(items: Iterable[Dict[str, Any]], fields: Optional[List[str]] = None) -> Iterator[str]:
+    """
+    Serialize entries as newline-delimited JSON, batched into larger chunks
+    """
+    batch = []
+    for item in items:
+        batch.append(json.dumps(project(item, fields), separators=(",", ":")))
+        if len(batch) >= _NDJSON_BATCH:
+            yield "\n".join(batch) + "\n"
+            batch = []
+
+    if batch:
+        yield "\n".join(batch) + "\n"
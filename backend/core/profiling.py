@@ -0,0 +1,168 @@
+"""
+Diagnostics for a stalled server
+Per-request timing middleware, an event-loop lag monitor that captures the
+stack of whatever is blocking the loop, and a sampling profiler that emits
+collapsed stacks (flamegraph.pl / speedscope compatible).
+
+Only imported when DEBUG_PROFILING is enabled, so it costs nothing otherwise.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from typing import Dict, Optional
+
+from backend.core.config import settings
+
+
+class RequestTimingMiddleware:
+    """
+    ASGI middleware that times every HTTP request
+    Adds a Server-Timing header and logs requests slower than SLOW_REQUEST_MS
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                duration_ms = (time.perf_counter() - started) * 1000
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", f"app;dur={duration_ms:.1f}".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            if duration_ms >= settings.SLOW_REQUEST_MS:
+                print(f"🐢 Slow request {scope['method']} {scope['path']}: {duration_ms:.0f}ms")
+
+
+class LoopLagMonitor:
+    """
+    Detects callbacks that block the event loop
+
+    A task on the loop records a heartbeat every interval; a watchdog thread
+    notices when the heartbeat goes stale and dumps the loop thread's stack
+    while it is still blocked.
+    """
+
+    def __init__(self):
+        self.threshold = settings.LOOP_LAG_THRESHOLD_MS / 1000
+        self.interval = min(0.1, self.threshold / 2)
+        self.last_beat = time.monotonic()
+        self.max_lag_ms = 0.0
+        self.stalls = 0
+        self.last_stall: Optional[dict] = None
+
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Start monitoring the running loop"""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._beat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        """Stop monitoring"""
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _beat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.max_lag_ms = max(self.max_lag_ms, (now - expected) * 1000)
+            self.last_beat = now
+
+    def _watch(self):
+        reported_beat = None
+        while not self._stopped.wait(self.interval):
+            beat = self.last_beat
+            lag = time.monotonic() - beat
+            if lag < self.threshold or beat == reported_beat:
+                continue
+
+            # Report each stall once, with the stack at the moment we saw it
+            reported_beat = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+            self.stalls += 1
+            self.last_stall = {"lagMs": round(lag * 1000), "at": time.time(), "stack": stack}
+            print(f"🐢 Event loop blocked for {lag * 1000:.0f}ms:\n{stack}")
+
+    def stats(self) -> dict:
+        """Lag statistics since the monitor started"""
+        return {
+            "thresholdMs": settings.LOOP_LAG_THRESHOLD_MS,
+            "maxLagMs": round(self.max_lag_ms, 1),
+            "stalls": self.stalls,
+            "lastStall": self.last_stall,
+        }
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+
+
+def sample_stacks(seconds: float, interval: float = 0.005) -> Dict[str, int]:
+    """
+    Sample the stacks of all other threads for a while
+    Blocking - run it in a worker thread so the loop keeps serving.
+
+    Returns:
+        Collapsed stacks ("root;caller;callee") mapped to sample counts
+    """
+    own_thread = threading.get_ident()
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    samples: Counter = Counter()
+    deadline = time.monotonic() + seconds
+
+    while time.monotonic() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(names.get(thread_id, f"thread-{thread_id}"))
+            samples[";".join(reversed(labels))] += 1
+        time.sleep(interval)
+
+    return dict(samples)
+
+
+def collapsed_profile(samples: Dict[str, int]) -> str:
+    """
+    Format samples in the collapsed-stack format read by flamegraph tools
+    """
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(samples.items()))
+
+
+# Global monitor instance
+loop_lag_monitor = LoopLagMonitor()
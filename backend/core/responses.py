@@ -0,0 +1,129 @@
+"""
+Custom HTTP responses
+"""
+
+from typing import Mapping, Optional
+
+import aiofiles
+from starlette.background import BackgroundTask
+from starlette.responses import Response
+
+
+class FileRangeResponse(Response):
+    """
+    Serve a byte range of a file
+
+    Streams the range in chunk_size reads. This is not sendfile: neither
+    uvicorn nor hypercorn offers the ASGI zero-copy send extension, and
+    the app has no access to their transports, so every byte still goes
+    through a userspace buffer.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        start: int,
+        end: int,
+        file_size: int,
+        status_code: int = 206,
+        headers: Optional[Mapping[str, str]] = None,
+        media_type: str = "application/octet-stream",
+        chunk_size: int = 1024 * 1024,
+        background: Optional[BackgroundTask] = None,
+    ):
+        self.path = path
+        self.start = start
+        self.end = end
+        self.chunk_size = chunk_size
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = background
+        self.init_headers(headers)
+
+        self.headers.setdefault("content-length", str(end - start + 1))
+        self.headers.setdefault("accept-ranges", "bytes")
+        if status_code == 206:
+            self.headers.setdefault("content-range", f"bytes {start}-{end}/{file_size}")
+
+    async def __call__(self, scope, receive, send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+
+        count = self.end - self.start + 1
+
+        if scope.get("method", "GET").upper() == "HEAD" or count <= 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        else:
+            async with aiofiles.open(self.path, "rb") as f:
+                await f.seek(self.start)
+                remaining = count
+                while remaining > 0:
+                    chunk = await f.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    await send({
+                        "type": "http.response.body",
+                        "body": chunk,
+                        "more_body": remaining > 0,
+                    })
+                if remaining > 0:
+                    # File shrank under us - terminate the body cleanly
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+        if self.background is not None:
+            await self.background()
+
+
+def parse_range_header(range_header: str, file_size: int) -> Optional[tuple]:
+    """
+    Parse a single-range "bytes=" header into an inclusive (start, end)
+
+    Returns None when the header is malformed or unsatisfiable.
+    Multi-range requests are not supported.
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first == "":
+            # Suffix range: last N bytes
+            length = int(last)
+            if length <= 0:
+                return None
+            start = max(file_size - length, 0)
+            end = file_size - 1
+        else:
+            start = int(first)
+            end = int(last) if last else file_size - 1
+    except ValueError:
+        return None
+
+    end = min(end, file_size - 1)
+    if start < 0 or start > end:
+        return None
+
+    return start, end
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against the current ETag
+    Uses weak comparison, as RFC 9110 requires for If-None-Match
+    """
+    if not if_none_match:
+        return False
+
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    if "*" in candidates:
+        return True
+
+    def opaque(tag: str) -> str:
+        return tag[2:] if tag.startswith("W/") else tag
+
+    return opaque(etag) in (opaque(tag) for tag in candidates)
@@ -0,0 +1,48 @@
+"""
+Startup timing
+Records how long each phase of server startup takes so cold-start
+regressions (e.g. in the packaged binary) are visible in the console
+"""
+
+import time
+from typing import List, Optional, Tuple
+
+
+class StartupTimer:
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+        self.reported = False
+
+    def start(self, origin: Optional[float] = None):
+        """Set the process start reference (defaults to now)"""
+        self.origin = origin if origin is not None else time.perf_counter()
+        self.phases = []
+        self.reported = False
+
+    def mark(self, phase: str):
+        """Record that a startup phase has finished"""
+        self.phases.append((phase, time.perf_counter()))
+
+    def elapsed_ms(self) -> float:
+        """Milliseconds since the origin"""
+        return (time.perf_counter() - self.origin) * 1000
+
+    def report(self) -> str:
+        """Format the phase timings, cumulative from the origin"""
+        parts = [
+            f"{phase} {(at - self.origin) * 1000:.0f}ms"
+            for phase, at in self.phases
+        ]
+        return " · ".join(parts)
+
+    def print_report(self):
+        """Print the report once"""
+        if self.reported:
+            return
+        self.reported = True
+        print(f"⏱️  Startup: {self.report()}")
+
+
+# Global startup timer instance
+startup_timer = StartupTimer()
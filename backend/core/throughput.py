@@ -0,0 +1,199 @@
+"""
+Per-client link measurements
+Measures upload and download throughput of every client host at the
+ASGI layer and combines it with the WebSocket round-trip time to
+recommend chunk sizes and parallelism - to clients through the
+negotiation endpoint, and to the server's own download writes.
+"""
+
+import math
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from backend.core.config import settings
+from backend.core.websocket_manager import ws_manager
+
+
+# Requests whose bodies are worth measuring
+_MEASURED_PATHS = ("/api/files/upload", "/api/files/download/", "/api/files/segment/")
+
+# Smoothing factor for new samples
+_EWMA_ALPHA = 0.3
+
+# Hosts remembered at most (least recently measured are dropped first)
+_MAX_HOSTS = 1024
+
+
+class LinkStats:
+    """Smoothed throughput of one client host"""
+
+    def __init__(self):
+        self.upload_bps: Optional[float] = None
+        self.download_bps: Optional[float] = None
+        self.samples = 0
+        self.updated_at = 0.0
+
+    def add(self, direction: str, bytes_per_second: float):
+        attr = "upload_bps" if direction == "upload" else "download_bps"
+        current = getattr(self, attr)
+        if current is None:
+            setattr(self, attr, bytes_per_second)
+        else:
+            setattr(self, attr, (1 - _EWMA_ALPHA) * current + _EWMA_ALPHA * bytes_per_second)
+        self.samples += 1
+        self.updated_at = time.time()
+
+
+def _chunk_size_for(bytes_per_second: float) -> int:
+    """
+    What the link moves in about CHUNK_TARGET_MS, rounded down to a power
+    of two within MIN_CHUNK_SIZE..MAX_CHUNK_SIZE
+    """
+    target = max(bytes_per_second * settings.CHUNK_TARGET_MS / 1000, 1)
+    chunk_size = 1 << int(math.log2(target))
+    return min(max(chunk_size, settings.MIN_CHUNK_SIZE), settings.MAX_CHUNK_SIZE)
+
+
+class ThroughputTracker:
+    """Throughput per client host, fed by ThroughputMiddleware"""
+
+    def __init__(self):
+        self.links: "OrderedDict[str, LinkStats]" = OrderedDict()
+
+    def record(self, host: str, direction: str, nbytes: int, seconds: float):
+        """Add one measured transfer ("upload" or "download")"""
+        if nbytes < settings.THROUGHPUT_MIN_SAMPLE or seconds <= 0:
+            return
+
+        link = self.links.pop(host, None) or LinkStats()
+        link.add(direction, nbytes / seconds)
+        self.links[host] = link
+
+        if len(self.links) > _MAX_HOSTS:
+            self.links.popitem(last=False)
+
+    def rtt_ms(self, host: str, client_id: Optional[str] = None) -> Optional[float]:
+        """
+        Smoothed WebSocket round-trip time of a client
+        Looked up by client ID when given, otherwise by host
+        """
+        if client_id is not None:
+            connection = ws_manager.active_connections.get(client_id)
+            return connection.rtt_ms if connection is not None else None
+
+        for connection in list(ws_manager.active_connections.values()):
+            client = getattr(connection.websocket, "client", None)
+            if client is not None and client.host == host and connection.rtt_ms is not None:
+                return connection.rtt_ms
+
+        return None
+
+    def _bps(self, host: Optional[str], direction: str) -> Optional[float]:
+        link = self.links.get(host) if host is not None else None
+        if link is None:
+            return None
+        return link.upload_bps if direction == "upload" else link.download_bps
+
+    def recommend(self, host: str, client_id: Optional[str] = None, direction: str = "download") -> dict:
+        """
+        Chunk size and parallelism for a client
+
+        The chunk size is what the link moves in about CHUNK_TARGET_MS.
+        Parallelism keeps the bandwidth-delay product in flight: one stream
+        per chunk that fits in the BDP, plus one to hide request overhead.
+        Without measurements the configured CHUNK_SIZE is used.
+        """
+        link = self.links.get(host)
+        bps = self._bps(host, direction)
+        rtt_ms = self.rtt_ms(host, client_id)
+
+        if bps is None:
+            chunk_size = settings.CHUNK_SIZE
+            parallelism = settings.DEFAULT_PARALLELISM
+        else:
+            chunk_size = _chunk_size_for(bps)
+
+            bdp = bps * (rtt_ms or 0) / 1000
+            parallelism = min(math.ceil(bdp / chunk_size) + 1, settings.MAX_PARALLELISM)
+
+        return {
+            "chunkSize": chunk_size,
+            "parallelism": parallelism,
+            "uploadBps": round(link.upload_bps) if link and link.upload_bps else None,
+            "downloadBps": round(link.download_bps) if link and link.download_bps else None,
+            "rttMs": round(rtt_ms, 1) if rtt_ms is not None else None,
+            "samples": link.samples if link else 0,
+            "measured": bps is not None,
+        }
+
+    def buffer_size(self, host: Optional[str]) -> int:
+        """
+        Write size the server should use for downloads to a client
+        Same figure as the download chunk size recommended to that client.
+        Uploads have no equivalent: Starlette has spooled the whole
+        multipart body before the handler reads it.
+        """
+        bps = self._bps(host, "download")
+        return _chunk_size_for(bps) if bps is not None else settings.CHUNK_SIZE
+
+
+class ThroughputMiddleware:
+    """
+    ASGI middleware that measures upload and download bodies
+
+    Uploads are timed from the first to the last body chunk received
+    (excluding the first chunk, which arrived before the clock started);
+    downloads from the response start until the last body chunk was
+    handed to the server, which applies transport backpressure.
+    """
+
+    def __init__(self, app, tracker: Optional[ThroughputTracker] = None):
+        self.app = app
+        self.tracker = tracker or throughput_tracker
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(_MEASURED_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        host = (scope.get("client") or ("unknown", 0))[0]
+        received = {"bytes": 0, "first": None, "first_size": 0, "last": None}
+        sent = {"bytes": 0, "start": None, "end": None}
+
+        async def measuring_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                size = len(message.get("body", b""))
+                if size:
+                    now = time.perf_counter()
+                    if received["first"] is None:
+                        received["first"] = now
+                        received["first_size"] = size
+                    received["bytes"] += size
+                    received["last"] = now
+            return message
+
+        async def measuring_send(message):
+            if message["type"] == "http.response.start":
+                sent["start"] = time.perf_counter()
+            await send(message)
+            if message["type"] == "http.response.body":
+                sent["bytes"] += len(message.get("body", b""))
+                sent["end"] = time.perf_counter()
+
+        try:
+            await self.app(scope, measuring_receive, measuring_send)
+        finally:
+            if received["last"] is not None:
+                self.tracker.record(
+                    host, "upload",
+                    received["bytes"] - received["first_size"],
+                    received["last"] - received["first"]
+                )
+            if sent["end"] is not None and sent["start"] is not None:
+                self.tracker.record(host, "download", sent["bytes"], sent["end"] - sent["start"])
+
+
+# Global tracker instance
+throughput_tracker = ThroughputTracker()
@@ -4,23 +4,130 @@ Utility functions and helpers for the backend
 
 import os
 import socket
-from typing import Optional
+import struct
+import sys
+import time
+from typing import List, Optional
 
 
-def get_local_ip() -> str:
+# Seconds a discovered address is trusted before re-probing
+LOCAL_IP_TTL = 60.0
+
+# UDP "connect" sends no packets, it only asks the kernel for a route.
+# Private ranges come after the public probe so LANs without a default
+# route (no internet) still resolve their real interface address.
+_ROUTE_PROBES = ("8.8.8.8", "10.255.255.255", "192.168.255.255", "172.31.255.255")
+
+# Linux ioctls reading an interface's flags and IPv4 address
+_SIOCGIFFLAGS = 0x8913
+_SIOCGIFADDR = 0x8915
+_IFF_UP = 0x1
+
+_local_ip_cache = {"ip": None, "fingerprint": None, "checked_at": 0.0}
+
+
+def _interface_fingerprint() -> Optional[tuple]:
     """
-    Get the local IP address of the machine
-    This will be used to display the connection URL
+    Cheap snapshot of the network interfaces, used to notice changes
     """
     try:
-        # Create a socket to determine the local IP
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        s.connect(("8.8.8.8", 80))
-        local_ip = s.getsockname()[0]
+        return tuple(socket.if_nameindex())
+    except (AttributeError, OSError):
+        return None
+
+
+def _interface_addresses() -> List[str]:
+    """
+    IPv4 addresses of the interfaces that are up, asked from the kernel
+    Empty where the ioctls are not available (non-Linux)
+    """
+    if not sys.platform.startswith("linux"):
+        return []
+    
+    import fcntl
+    
+    addresses = []
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        for _, name in socket.if_nameindex():
+            request = struct.pack("256s", name.encode()[:15])
+            try:
+                flags = struct.unpack("H", fcntl.ioctl(s.fileno(), _SIOCGIFFLAGS, request)[16:18])[0]
+                if not flags & _IFF_UP:
+                    continue
+                reply = fcntl.ioctl(s.fileno(), _SIOCGIFADDR, request)
+            except OSError:
+                continue  # Gone, or no IPv4 address
+            addresses.append(socket.inet_ntoa(reply[20:24]))
+    except OSError:
+        pass
+    finally:
         s.close()
-        return local_ip
-    except Exception:
-        return "127.0.0.1"
+    
+    return addresses
+
+
+def _discover_local_ip() -> str:
+    """
+    Find the address of the interface other devices can reach us on
+    """
+    for probe in _ROUTE_PROBES:
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            s.connect((probe, 80))
+            local_ip = s.getsockname()[0]
+            if not local_ip.startswith("127.") and local_ip != "0.0.0.0":
+                return local_ip
+        except OSError:
+            continue
+        finally:
+            s.close()
+    
+    # No route to any probe (e.g. a LAN without gateway): read the
+    # interfaces directly, preferring real addresses over link-local ones
+    addresses = [ip for ip in _interface_addresses() if not ip.startswith("127.")]
+    addresses.sort(key=lambda ip: ip.startswith("169.254."))
+    if addresses:
+        return addresses[0]
+    
+    # Elsewhere the hostname's addresses come from the local interface
+    # list (Windows, macOS) - Linux would ask DNS, and was handled above
+    if not sys.platform.startswith("linux"):
+        try:
+            for local_ip in socket.gethostbyname_ex(socket.gethostname())[2]:
+                if not local_ip.startswith("127."):
+                    return local_ip
+        except OSError:
+            pass
+    
+    return "127.0.0.1"
+
+
+def get_local_ip(refresh: bool = False) -> str:
+    """
+    Get the local IP address of the machine
+    This will be used to display the connection URL
+    
+    The result is cached and re-discovered when the interface list changes,
+    after LOCAL_IP_TTL seconds, or when refresh is True. Discovery may
+    block - call from a worker thread in async code.
+    """
+    fingerprint = _interface_fingerprint()
+    now = time.monotonic()
+    
+    if (
+        not refresh
+        and _local_ip_cache["ip"] is not None
+        and _local_ip_cache["fingerprint"] == fingerprint
+        and now - _local_ip_cache["checked_at"] < LOCAL_IP_TTL
+    ):
+        return _local_ip_cache["ip"]
+    
+    _local_ip_cache["ip"] = _discover_local_ip()
+    _local_ip_cache["fingerprint"] = fingerprint
+    _local_ip_cache["checked_at"] = now
+    
+    return _local_ip_cache["ip"]
 
 
 def format_bytes(size_bytes: int) -> str:
@@ -3,85 +3,300 @@ WebSocket Connection Manager
 Handles real-time communication between devices
 """
 
-from typing import Dict, List, Any
+from typing import Awaitable, Callable, Dict, List, Any, Optional
 from fastapi import WebSocket
 import json
+import time
 import asyncio
 
+from backend.core.config import settings
+from backend.core.ws_protocol import Connection, negotiate_codec
+
 
 class WebSocketManager:
     """Manages WebSocket connections for real-time device communication"""
     
     def __init__(self):
-        # Active connections: {client_id: websocket}
-        self.active_connections: Dict[str, WebSocket] = {}
+        # Active connections: {client_id: connection}
+        self.active_connections: Dict[str, Connection] = {}
         
         # Device information: {client_id: device_info}
+        # Only modify through set_device / set_device_mode / remove_device
+        # so the indexes and revision stay in sync
         self.devices: Dict[str, Dict[str, Any]] = {}
+        
+        # Secondary indexes: {mode: {client_id: device_info}} and
+        # {deviceType: {client_id: device_info}}, insertion ordered
+        self.devices_by_mode: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.devices_by_type: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        
+        # Bumped on every registry change; validates cached device listings
+        self.revision = 0
+        
+        # A device list broadcast / reap pass is already scheduled
+        self._broadcast_scheduled = False
+        self._reap_scheduled = False
+        
+        # Called with (client_id, online) when a client connects or goes away
+        self._presence_listeners: List[Callable[[str, bool], Awaitable[None]]] = []
+    
+    def add_presence_listener(self, listener: Callable[[str, bool], Awaitable[None]]):
+        """Register a coroutine function run when a client connects or goes away"""
+        self._presence_listeners.append(listener)
+    
+    def _notify_presence(self, client_id: str, online: bool):
+        for listener in self._presence_listeners:
+            asyncio.create_task(listener(client_id, online))
+    
+    def _index(self, client_id: str, device: Dict[str, Any]):
+        self.devices_by_mode.setdefault(device["mode"], {})[client_id] = device
+        self.devices_by_type.setdefault(device["deviceType"], {})[client_id] = device
+    
+    def _unindex(self, client_id: str, device: Dict[str, Any]):
+        for index, key in ((self.devices_by_mode, device["mode"]), (self.devices_by_type, device["deviceType"])):
+            bucket = index.get(key)
+            if bucket is not None:
+                bucket.pop(client_id, None)
+                if not bucket:
+                    del index[key]
+    
+    def set_device(self, client_id: str, device: Dict[str, Any]):
+        """Add or replace a device in the registry"""
+        previous = self.devices.get(client_id)
+        if previous is not None:
+            self._unindex(client_id, previous)
+        
+        self.devices[client_id] = device
+        self._index(client_id, device)
+        self.revision += 1
+    
+    def set_device_mode(self, client_id: str, mode: str) -> Optional[str]:
+        """
+        Change a device's mode
+        
+        Returns:
+            The previous mode, or None if the device is not registered
+        """
+        device = self.devices.get(client_id)
+        if device is None:
+            return None
+        
+        old_mode = device["mode"]
+        self._unindex(client_id, device)
+        device["mode"] = mode
+        self._index(client_id, device)
+        self.revision += 1
+        
+        return old_mode
+    
+    def remove_device(self, client_id: str) -> bool:
+        """Drop a device from the registry, True if it was registered"""
+        device = self.devices.pop(client_id, None)
+        if device is None:
+            return False
+        
+        self._unindex(client_id, device)
+        self.revision += 1
+        
+        return True
     
-    async def connect(self, websocket: WebSocket, client_id: str):
-        """Accept new WebSocket connection"""
-        await websocket.accept()
-        self.active_connections[client_id] = websocket
-        print(f"✅ Client {client_id} connected")
+    def devices_where(self, mode: Optional[str] = None, device_type: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Registered devices filtered by mode and/or device type
+        Served from the indexes - the result must not be modified
+        """
+        if mode is None and device_type is None:
+            return self.devices
+        
+        if mode is None:
+            return self.devices_by_type.get(device_type, {})
+        
+        by_mode = self.devices_by_mode.get(mode, {})
+        if device_type is None:
+            return by_mode
+        
+        return {
+            client_id: device
+            for client_id, device in by_mode.items()
+            if device["deviceType"] == device_type
+        }
+    
+    async def connect(self, websocket: WebSocket, client_id: str) -> Connection:
+        """
+        Accept new WebSocket connection
+        Negotiates the encoding from the offered subprotocols and enables
+        event batching when the client connects with ?batch=1
+        """
+        codec, subprotocol = negotiate_codec(websocket)
+        await websocket.accept(subprotocol=subprotocol)
+        
+        batched = websocket.query_params.get("batch") in ("1", "true")
+        batch_window = settings.WS_BATCH_WINDOW_MS / 1000 if batched else 0.0
+        
+        connection = Connection(
+            websocket,
+            codec,
+            batch_window,
+            max_queue=settings.WS_QUEUE_MAX,
+            max_control=settings.WS_CONTROL_QUEUE_MAX
+        )
+        connection.on_error = lambda e: self._on_send_error(client_id, connection, e)
+        connection.start()
+        
+        # A reconnect replaces the previous connection for this client
+        previous = self.active_connections.get(client_id)
+        if previous is not None:
+            previous.close()
+        self.active_connections[client_id] = connection
+        print(f"✅ Client {client_id} connected ({codec.name}{', batched' if batched else ''})")
         
         # Send current devices list to new client
         await self.send_device_list(client_id)
+        
+        self._notify_presence(client_id, True)
+        
+        return connection
+    
+    def _on_send_error(self, client_id: str, connection: Connection, error: Exception):
+        """
+        Handle a connection whose writer failed
+        The connection is already closed; evict it with any others that
+        failed in the same burst in one reap pass.
+        """
+        print(f"Error sending to {client_id}: {error}")
+        self._schedule_reap()
+    
+    def _schedule_reap(self):
+        if self._reap_scheduled:
+            return
+        self._reap_scheduled = True
+        asyncio.create_task(self._scheduled_reap())
+    
+    async def _scheduled_reap(self):
+        await asyncio.sleep(0)
+        self._reap_scheduled = False
+        self.reap()
+    
+    def reap(self) -> int:
+        """
+        Evict every dead or unresponsive connection in one pass
+        
+        Returns:
+            Number of clients evicted
+        """
+        now = time.monotonic()
+        stale = [
+            client_id
+            for client_id, connection in self.active_connections.items()
+            if connection.is_stale(now, settings.WS_PROBE_TIMEOUT)
+        ]
+        
+        for client_id in stale:
+            self.active_connections.pop(client_id).close()
+            self.remove_device(client_id)
+            self._notify_presence(client_id, False)
+        
+        if stale:
+            print(f"🧹 Reaped {len(stale)} unresponsive client(s)")
+            self._schedule_device_list_broadcast()
+        
+        return len(stale)
     
-    def disconnect(self, client_id: str):
-        """Remove disconnected client"""
-        if client_id in self.active_connections:
+    async def monitor_liveness(self):
+        """
+        Probe clients with pings and reap the ones that stop answering
+        Runs for the lifetime of the server
+        """
+        while True:
+            await asyncio.sleep(settings.WS_PROBE_INTERVAL)
+            
+            self.reap()
+            
+            probe = {"type": "ping", "ts": round(time.monotonic() * 1000, 1)}
+            for connection in list(self.active_connections.values()):
+                connection.enqueue(probe)
+    
+    def disconnect(self, client_id: str, connection: Connection = None):
+        """
+        Remove disconnected client
+        When a connection is given, only remove the client if that connection
+        is still the current one (it may have reconnected since).
+        """
+        current = self.active_connections.get(client_id)
+        if connection is not None and current is not connection:
+            connection.close()
+            return
+        
+        if current is not None:
             del self.active_connections[client_id]
+            current.close()
         
-        if client_id in self.devices:
-            del self.devices[client_id]
+        self.remove_device(client_id)
+        self._notify_presence(client_id, False)
         
         print(f"❌ Client {client_id} disconnected")
         
         # Notify all clients about device list update
-        asyncio.create_task(self.broadcast_device_list())
+        self._schedule_device_list_broadcast()
+    
+    def _schedule_device_list_broadcast(self):
+        """Coalesce a burst of registry changes into a single broadcast"""
+        if self._broadcast_scheduled:
+            return
+        self._broadcast_scheduled = True
+        asyncio.create_task(self._scheduled_broadcast())
+    
+    async def _scheduled_broadcast(self):
+        # Yield once so every disconnect in this burst lands first
+        await asyncio.sleep(0)
+        self._broadcast_scheduled = False
+        await self.broadcast_device_list()
     
     async def send_personal_message(self, client_id: str, message: dict):
-        """Send message to specific client"""
-        if client_id in self.active_connections:
-            try:
-                await self.active_connections[client_id].send_json(message)
-            except Exception as e:
-                print(f"Error sending to {client_id}: {e}")
-                self.disconnect(client_id)
+        """
+        Send message to specific client
+        Queued on the client's connection - never waits for the client
+        """
+        connection = self.active_connections.get(client_id)
+        if connection is not None:
+            connection.enqueue(message)
     
     async def broadcast(self, message: dict, exclude: List[str] = None):
         """Broadcast message to all connected clients"""
         exclude = exclude or []
         
-        disconnected = []
-        for client_id, websocket in self.active_connections.items():
+        for client_id, connection in list(self.active_connections.items()):
             if client_id not in exclude:
-                try:
-                    await websocket.send_json(message)
-                except Exception as e:
-                    print(f"Error broadcasting to {client_id}: {e}")
-                    disconnected.append(client_id)
-        
-        # Clean up disconnected clients
-        for client_id in disconnected:
-            self.disconnect(client_id)
+                connection.enqueue(message)
     
     async def handle_message(self, client_id: str, data: dict):
         """Handle incoming WebSocket messages"""
         msg_type = data.get("type")
         
+        if msg_type == "batch":
+            # Several client events packed into one frame
+            for message in data.get("messages", []):
+                await self.handle_message(client_id, message)
+            return
+        
+        if msg_type == "pong":
+            # Reply to a server liveness probe
+            connection = self.active_connections.get(client_id)
+            if connection is not None:
+                connection.record_pong(data.get("ts"))
+            return
+        
         print(f"📨 Message from {client_id}: type={msg_type}, data={data}")
         
         if msg_type == "register":
             # Register device information
-            self.devices[client_id] = {
+            self.set_device(client_id, {
                 "id": client_id,
                 "name": data.get("name", "Unknown"),
                 "deviceType": data.get("deviceType", "DESKTOP"),
                 "mode": data.get("mode", "HOME"),  # HOME, SEND, RECEIVE
                 "avatarId": data.get("avatarId", 0)
-            }
+            })
             
             print(f"✅ Registered device: {self.devices[client_id]}")
             
@@ -90,11 +305,10 @@ class WebSocketManager:
         
         elif msg_type == "update_mode":
             # Update device mode (HOME, SEND, RECEIVE)
-            if client_id in self.devices:
-                old_mode = self.devices[client_id]["mode"]
-                new_mode = data.get("mode", "HOME")
-                self.devices[client_id]["mode"] = new_mode
-                
+            new_mode = data.get("mode", "HOME")
+            old_mode = self.set_device_mode(client_id, new_mode)
+            
+            if old_mode is not None:
                 print(f"🔄 Mode updated for {client_id}: {old_mode} → {new_mode}")
                 print(f"📋 All devices: {self.devices}")
                 
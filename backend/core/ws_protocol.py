@@ -0,0 +1,312 @@
+"""
+WebSocket wire protocol
+Negotiates the message encoding (JSON, MessagePack or CBOR) per connection,
+queues outgoing messages per connection with priority lanes, and optionally
+batches outgoing events into a single frame
+"""
+
+import asyncio
+import importlib
+import importlib.util
+import json
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+
+# Subprotocol name prefix offered by clients, e.g. "wldrop.msgpack"
+SUBPROTOCOL_PREFIX = "wldrop."
+
+
+class JsonCodec:
+    """Text JSON frames (default, understood by every client)"""
+    name = "json"
+    binary = False
+
+    def encode(self, message: Any) -> str:
+        return json.dumps(message, separators=(",", ":"))
+
+    def decode(self, data) -> Any:
+        return json.loads(data)
+
+
+class _LazyCodec:
+    """Binary codec whose library is imported on first use"""
+    module_name = ""
+    binary = True
+
+    def __init__(self):
+        self._module = None
+
+    @property
+    def module(self):
+        if self._module is None:
+            self._module = importlib.import_module(self.module_name)
+        return self._module
+
+
+class MsgPackCodec(_LazyCodec):
+    """Binary MessagePack frames"""
+    name = "msgpack"
+    module_name = "msgpack"
+
+    def encode(self, message: Any) -> bytes:
+        return self.module.packb(message, use_bin_type=True)
+
+    def decode(self, data: bytes) -> Any:
+        return self.module.unpackb(data, raw=False)
+
+
+class CborCodec(_LazyCodec):
+    """Binary CBOR frames"""
+    name = "cbor"
+    module_name = "cbor2"
+
+    def encode(self, message: Any) -> bytes:
+        return self.module.dumps(message)
+
+    def decode(self, data: bytes) -> Any:
+        return self.module.loads(data)
+
+
+JSON_CODEC = JsonCodec()
+
+# Available codecs keyed by name. Binary encodings are optional and only
+# offered if their library is installed.
+CODECS: Dict[str, Any] = {"json": JSON_CODEC}
+for _codec in (MsgPackCodec(), CborCodec()):
+    if importlib.util.find_spec(_codec.module_name) is not None:
+        CODECS[_codec.name] = _codec
+
+
+def negotiate_codec(websocket: WebSocket) -> tuple:
+    """
+    Pick the encoding for a connection from the offered subprotocols
+
+    Clients offer e.g. "wldrop.msgpack, wldrop.json" in Sec-WebSocket-Protocol;
+    the first one this server supports wins. Clients that offer nothing get JSON.
+
+    Returns:
+        Tuple of (codec, subprotocol to echo back or None)
+    """
+    offered = websocket.scope.get("subprotocols") or []
+
+    for subprotocol in offered:
+        if subprotocol.startswith(SUBPROTOCOL_PREFIX):
+            codec = CODECS.get(subprotocol[len(SUBPROTOCOL_PREFIX):])
+            if codec is not None:
+                return codec, subprotocol
+
+    return JSON_CODEC, None
+
+
+def coalesce_key(message: dict) -> Optional[tuple]:
+    """
+    Lane for an outgoing message
+
+    Returns None for control messages (transfer requests, accepts, ...) which
+    are always delivered in order. State updates return a key: a newer message
+    with the same key replaces the queued one, since only the latest matters.
+    """
+    msg_type = message.get("type")
+
+    if msg_type == "device_list":
+        return ("device_list",)
+    if msg_type == "transfer_progress":
+        return ("transfer_progress", message.get("transferId"))
+    if msg_type == "ping":
+        return ("ping",)
+
+    return None
+
+
+class Connection:
+    """
+    A negotiated client connection
+
+    Outgoing messages go into a bounded per-connection queue drained by a
+    dedicated writer task, so a slow client never blocks the handler or
+    broadcast that notifies it. Control messages are sent before queued
+    state updates; state updates are coalesced and the oldest ones dropped
+    when the queue backs up. A control message about a transfer supersedes
+    that transfer's queued progress update, so progress never arrives
+    after the transfer's later state changes.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        codec=JSON_CODEC,
+        batch_window: float = 0.0,
+        max_queue: int = 256,
+        max_control: int = 1024,
+        on_error: Optional[Callable[[Exception], None]] = None
+    ):
+        self.websocket = websocket
+        self.codec = codec
+        self.batch_window = batch_window  # seconds, 0 sends every message as its own frame
+        self.max_queue = max_queue
+        self.max_control = max_control
+        self.on_error = on_error
+
+        self.closed = False
+        self.dropped = 0  # State updates superseded or dropped under backpressure
+
+        # Liveness: any received frame counts as a sign of life. Clients that
+        # answer server pings are reaped when they go quiet; others rely on
+        # protocol-level pings closing the socket.
+        self.last_seen = time.monotonic()
+        self.answers_pings = False
+        self.rtt_ms: Optional[float] = None
+
+        self._control: Deque[dict] = deque()
+        self._bulk: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._wakeup = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the writer task"""
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write_loop())
+
+    def enqueue(self, message: dict) -> bool:
+        """
+        Queue a message for sending without waiting for the client
+
+        Returns:
+            False if the connection is closed or its control lane overflowed
+        """
+        if self.closed:
+            return False
+
+        key = coalesce_key(message)
+
+        if key is None:
+            if len(self._control) >= self.max_control:
+                # Client is not reading at all - give up on it
+                self._fail(RuntimeError("outbound queue overflow"))
+                return False
+            self._control.append(message)
+
+            # Control goes out first, so a queued progress update for the same
+            # transfer would arrive after it (e.g. after transfer_complete)
+            transfer_id = message.get("transferId")
+            if transfer_id is not None and self._bulk.pop(("transfer_progress", transfer_id), None) is not None:
+                self.dropped += 1
+        else:
+            if key in self._bulk:
+                del self._bulk[key]
+                self.dropped += 1
+            elif len(self._bulk) >= self.max_queue:
+                self._bulk.popitem(last=False)
+                self.dropped += 1
+            self._bulk[key] = message
+
+        self._wakeup.set()
+        return True
+
+    def queued(self) -> int:
+        """Number of messages waiting to be sent"""
+        return len(self._control) + len(self._bulk)
+
+    def _pop_next(self) -> dict:
+        if self._control:
+            return self._control.popleft()
+        return self._bulk.popitem(last=False)[1]
+
+    def _drain(self) -> List[dict]:
+        messages = list(self._control)
+        messages.extend(self._bulk.values())
+        self._control.clear()
+        self._bulk.clear()
+        return messages
+
+    async def _write_loop(self):
+        try:
+            while not self.closed:
+                await self._wakeup.wait()
+
+                if self.batch_window:
+                    # Let events raised in the same window share a frame
+                    await asyncio.sleep(self.batch_window)
+
+                self._wakeup.clear()
+
+                while self._control or self._bulk:
+                    if self.batch_window:
+                        messages = self._drain()
+                        payload = messages[0] if len(messages) == 1 else {"type": "batch", "messages": messages}
+                    else:
+                        # One at a time so later updates can still be coalesced
+                        payload = self._pop_next()
+
+                    await self._send_frame(self.codec.encode(payload))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._fail(e)
+
+    def _fail(self, error: Exception):
+        if self.closed:
+            return
+        self.close()
+        if self.on_error is not None:
+            self.on_error(error)
+
+    async def _send_frame(self, payload):
+        if isinstance(payload, bytes):
+            await self.websocket.send_bytes(payload)
+        else:
+            await self.websocket.send_text(payload)
+
+    async def receive(self) -> Any:
+        """
+        Receive and decode one frame
+        Text frames are always JSON; binary frames use the negotiated codec.
+        """
+        message = await self.websocket.receive()
+
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+
+        self.last_seen = time.monotonic()
+
+        if message.get("bytes") is not None:
+            return self.codec.decode(message["bytes"])
+
+        return JSON_CODEC.decode(message["text"])
+
+    def record_pong(self, sent_at_ms: Optional[float]):
+        """Note a pong reply, updating the smoothed round-trip time"""
+        self.answers_pings = True
+        if sent_at_ms is None:
+            return
+        rtt = max(time.monotonic() * 1000 - sent_at_ms, 0.0)
+        self.rtt_ms = rtt if self.rtt_ms is None else 0.8 * self.rtt_ms + 0.2 * rtt
+
+    def is_stale(self, now: float, idle_timeout: float) -> bool:
+        """Closed, or a ping-answering client that has gone quiet"""
+        return self.closed or (self.answers_pings and now - self.last_seen > idle_timeout)
+
+    def close(self):
+        """Stop the writer, drop queued messages and close the socket"""
+        if self.closed:
+            return
+        self.closed = True
+        self._control.clear()
+        self._bulk.clear()
+
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        self._writer = None
+
+        asyncio.create_task(self._close_socket())
+
+    async def _close_socket(self):
+        try:
+            await self.websocket.close()
+        except Exception:
+            # Already closed by the client or the server
+            pass
@@ -15,6 +15,9 @@ from backend.core.config import settings
 from backend.api import files, devices
 from backend.core.websocket_manager import ws_manager
 from backend.core.shutdown import shutdown_manager
+from backend.core.startup import startup_timer
+from backend.core.throughput import ThroughputMiddleware
+from backend.services.sync import sync_registry
 
 
 @asynccontextmanager
@@ -27,11 +30,34 @@ async def lifespan(app: FastAPI):
     # Ensure upload directory exists
     os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
     
+    # Folder snapshots of a previous run are unusable - their metadata was in memory
+    orphans = sync_registry.remove_orphans()
+    if orphans:
+        print(f"🗑️  Removed {orphans} stale sync snapshots")
+    
     # Start auto-shutdown monitor
     asyncio.create_task(shutdown_manager.monitor())
     
+    # Probe WebSocket clients and reap ghost connections
+    asyncio.create_task(ws_manager.monitor_liveness())
+    
+    # Free queue slots of transfers that stopped moving
+    if settings.TRANSFER_IDLE_TIMEOUT > 0:
+        asyncio.create_task(files.monitor_idle_transfers())
+    
+    # Event-loop lag monitor (diagnostics only)
+    if settings.DEBUG_PROFILING:
+        from backend.core.profiling import loop_lag_monitor
+        loop_lag_monitor.start()
+    
+    startup_timer.mark("ready")
+    startup_timer.print_report()
+    
     yield
     
+    if settings.DEBUG_PROFILING:
+        loop_lag_monitor.stop()
+    
     # Shutdown
     print("👋 WL-Drop Server shutting down")
 
@@ -52,31 +78,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-client throughput measurement (feeds /api/files/negotiate)
+app.add_middleware(ThroughputMiddleware)
+
+# Bytes moving for a transfer keep its queue slot
+app.add_middleware(files.TransferActivityMiddleware)
+
 # Include API routers
 app.include_router(devices.router, prefix="/api", tags=["devices"])
 app.include_router(files.router, prefix="/api", tags=["files"])
 
+# Diagnostics: request timing and profiling endpoints (off by default)
+if settings.DEBUG_PROFILING:
+    from backend.api import debug
+    from backend.core.profiling import RequestTimingMiddleware
+    
+    app.add_middleware(RequestTimingMiddleware)
+    app.include_router(debug.router, prefix="/api", tags=["debug"])
+
 
 # WebSocket endpoint for real-time communication
 @app.websocket("/ws/{client_id}")
 async def websocket_endpoint(websocket: WebSocket, client_id: str):
     """WebSocket connection for real-time device discovery and file transfer notifications"""
-    await ws_manager.connect(websocket, client_id)
+    connection = await ws_manager.connect(websocket, client_id)
     try:
         while True:
-            data = await websocket.receive_json()
+            data = await connection.receive()
             await ws_manager.handle_message(client_id, data)
     except WebSocketDisconnect:
-        ws_manager.disconnect(client_id)
+        ws_manager.disconnect(client_id, connection)
 
 
 # Health check endpoint
 @app.get("/api/health")
 async def health_check():
     """Server health check"""
+    from fastapi.concurrency import run_in_threadpool
     from backend.core.utils import get_local_ip
     
-    local_ip = get_local_ip()
+    # Re-discovery after a cache miss can block
+    local_ip = await run_in_threadpool(get_local_ip)
     
     return {
         "status": "healthy",
@@ -121,3 +163,6 @@ else:
             "message": "WL-Drop API Server",
             "note": "Frontend not built. Run 'npm run build' in the root directory."
         }
+
+
+startup_timer.mark("app loaded")
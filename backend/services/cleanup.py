@@ -1,12 +1,11 @@
 """
 Cleanup utilities for file transfers
-Files are now deleted immediately after successful download
-This module provides manual cleanup functions if needed
+Transfers are deleted by the files API once the receiver has downloaded
+every file. These helpers remove transfers manually through the storage
+backend, so they work for files on disk and in the RAM tier alike.
 """
 
-import shutil
-from pathlib import Path
-from backend.core.config import settings
+from backend.services.storage import storage
 
 
 def cleanup_transfer(transfer_id: str) -> bool:
@@ -19,16 +18,12 @@ def cleanup_transfer(transfer_id: str) -> bool:
     Returns:
         True if cleanup was successful, False otherwise
     """
-    transfer_dir = Path(settings.UPLOAD_DIR) / transfer_id
-    
-    if transfer_dir.exists():
-        try:
-            shutil.rmtree(transfer_dir)
+    try:
+        if storage.delete_transfer(transfer_id):
             print(f"🗑️  Deleted transfer directory: {transfer_id}")
             return True
-        except Exception as e:
-            print(f"Error deleting {transfer_id}: {e}")
-            return False
+    except Exception as e:
+        print(f"Error deleting {transfer_id}: {e}")
     
     return False
 
@@ -40,21 +35,16 @@ def cleanup_all_transfers() -> int:
     Returns:
         Number of directories deleted
     """
-    upload_dir = Path(settings.UPLOAD_DIR)
-    
-    if not upload_dir.exists():
-        return 0
-    
     deleted_count = 0
     
-    for item in upload_dir.iterdir():
-        if item.is_dir() and item.name.startswith("transfer_"):
+    for transfer_id in storage.list_transfers():
+        if transfer_id.startswith("transfer_"):
             try:
-                shutil.rmtree(item)
+                storage.delete_transfer(transfer_id)
                 deleted_count += 1
-                print(f"🗑️  Deleted transfer: {item.name}")
+                print(f"🗑️  Deleted transfer: {transfer_id}")
             except Exception as e:
-                print(f"Error deleting {item.name}: {e}")
+                print(f"Error deleting {transfer_id}: {e}")
     
     if deleted_count > 0:
         print(f"✅ Manual cleanup completed: {deleted_count} transfers removed")
@@ -0,0 +1,242 @@
+"""
+Transfer scheduler
+Queues the transfers addressed to each receiver and admits at most
+MAX_ACTIVE_TRANSFERS of them at a time, in the order chosen by
+TRANSFER_QUEUE_POLICY:
+
+    fifo      - in the order they were initiated
+    sjf       - smallest total size first, so quick transfers are not
+                stuck behind a large backup
+    priority  - highest sender priority first
+
+Transfers waiting longer than TRANSFER_QUEUE_MAX_WAIT seconds go ahead of
+the policy order, so large or low-priority transfers cannot starve.
+Admitted transfers give their slot back when the receiver goes offline
+(once their running requests have ended), or when no bytes were uploaded
+or downloaded for TRANSFER_IDLE_TIMEOUT seconds.
+The scheduler only keeps the bookkeeping; the API layer notifies devices.
+"""
+
+import itertools
+import time
+from typing import Dict, List, Optional
+
+from backend.core.config import settings
+
+
+class ScheduledTransfer:
+    """A transfer known to the scheduler"""
+
+    def __init__(self, transfer_id: str, receiver_id: str, sender_id: str, size: int, priority: int, seq: int):
+        self.transfer_id = transfer_id
+        self.receiver_id = receiver_id
+        self.sender_id = sender_id
+        self.size = size
+        self.priority = priority
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+        self.active = False
+        self.last_activity = self.enqueued_at  # Reset on admission and while bytes move
+        self.requests = 0  # Upload/download requests in flight
+        self.release_when_done = False  # Receiver went offline during a request
+
+
+class TransferScheduler:
+    """Per-receiver transfer queues"""
+
+    def __init__(self, policy: str, max_active: int, max_wait: float):
+        self.policy = policy
+        self.max_active = max_active  # 0 admits everything immediately
+        self.max_wait = max_wait
+
+        # {receiver_id: {transfer_id: ScheduledTransfer}}
+        self._receivers: Dict[str, Dict[str, ScheduledTransfer]] = {}
+        self._transfers: Dict[str, ScheduledTransfer] = {}
+        self._seq = itertools.count()
+
+    def _order_key(self, entry: ScheduledTransfer, now: float) -> tuple:
+        starving = self.max_wait > 0 and now - entry.enqueued_at >= self.max_wait
+        if starving:
+            return (0, 0, entry.seq)
+        if self.policy == "sjf":
+            return (1, entry.size, entry.seq)
+        if self.policy == "priority":
+            return (1, -entry.priority, entry.seq)
+        return (1, 0, entry.seq)
+
+    def queue(self, receiver_id: str) -> List[ScheduledTransfer]:
+        """Waiting transfers of a receiver, next to be admitted first"""
+        now = time.monotonic()
+        waiting = [entry for entry in self._receivers.get(receiver_id, {}).values() if not entry.active]
+        return sorted(waiting, key=lambda entry: self._order_key(entry, now))
+
+    def active_count(self, receiver_id: str) -> int:
+        return sum(entry.active for entry in self._receivers.get(receiver_id, {}).values())
+
+    def _admit(self, receiver_id: str) -> List[ScheduledTransfer]:
+        admitted = []
+        for entry in self.queue(receiver_id):
+            if self.max_active and self.active_count(receiver_id) >= self.max_active:
+                break
+            entry.active = True
+            entry.last_activity = time.monotonic()
+            admitted.append(entry)
+        return admitted
+
+    def admit(self, receiver_id: str) -> List[ScheduledTransfer]:
+        """Fill the receiver's free slots, e.g. when it comes back online"""
+        for entry in self._receivers.get(receiver_id, {}).values():
+            entry.release_when_done = False
+        return self._admit(receiver_id)
+
+    def submit(
+        self,
+        transfer_id: str,
+        receiver_id: str,
+        sender_id: str,
+        size: int = 0,
+        priority: int = 0
+    ) -> List[ScheduledTransfer]:
+        """
+        Queue a transfer for its receiver
+
+        Returns:
+            Transfers admitted as a result (possibly including this one)
+        """
+        previous = self._transfers.get(transfer_id)
+        if previous is not None and previous.receiver_id == receiver_id:
+            # Initiated again - keep its place, refresh what it is ranked by
+            previous.size = size
+            previous.priority = priority
+            return self._admit(receiver_id)
+
+        if previous is not None:
+            self.finish(transfer_id)
+
+        entry = ScheduledTransfer(transfer_id, receiver_id, sender_id, size, priority, next(self._seq))
+        self._transfers[transfer_id] = entry
+        self._receivers.setdefault(receiver_id, {})[transfer_id] = entry
+
+        return self._admit(receiver_id)
+
+    def touch(self, transfer_id: str):
+        """Record upload or download activity of a transfer"""
+        entry = self._transfers.get(transfer_id)
+        if entry is not None:
+            entry.last_activity = time.monotonic()
+
+    def open_request(self, transfer_id: str):
+        """Record the start of an upload or download request"""
+        entry = self._transfers.get(transfer_id)
+        if entry is not None:
+            entry.requests += 1
+            entry.last_activity = time.monotonic()
+
+    def close_request(self, transfer_id: str) -> bool:
+        """
+        Record the end of an upload or download request
+
+        Returns:
+            True if the transfer was released because its receiver went
+            offline while the request ran
+        """
+        entry = self._transfers.get(transfer_id)
+        if entry is None:
+            return False
+
+        entry.requests = max(entry.requests - 1, 0)
+        entry.last_activity = time.monotonic()
+        if entry.requests or not entry.release_when_done:
+            return False
+
+        self._forget(entry)
+        return True
+
+    def _forget(self, entry: ScheduledTransfer):
+        del self._transfers[entry.transfer_id]
+        transfers = self._receivers.get(entry.receiver_id, {})
+        transfers.pop(entry.transfer_id, None)
+        if not transfers:
+            self._receivers.pop(entry.receiver_id, None)
+
+    def update_size(self, transfer_id: str, size: int):
+        """Grow the known size of a transfer whose files are still uploading"""
+        entry = self._transfers.get(transfer_id)
+        if entry is not None and size > entry.size:
+            entry.size = size
+
+    def finish(self, transfer_id: str) -> List[ScheduledTransfer]:
+        """
+        Forget a completed, rejected or deleted transfer
+
+        Returns:
+            Transfers of the same receiver admitted into the freed slot
+        """
+        entry = self._transfers.pop(transfer_id, None)
+        if entry is None:
+            return []
+
+        transfers = self._receivers.get(entry.receiver_id, {})
+        transfers.pop(transfer_id, None)
+        if not transfers:
+            self._receivers.pop(entry.receiver_id, None)
+            return []
+
+        return self._admit(entry.receiver_id)
+
+    def release_receiver(self, receiver_id: str) -> List[str]:
+        """
+        Forget the admitted transfers of a receiver that went offline
+        Transfers with requests still running keep their slot until the
+        last one ends (see close_request), so a brief reconnect does not
+        let more transfers start than the limit. Its queued transfers stay
+        queued until admit() is called again.
+
+        Returns:
+            IDs of the released transfers
+        """
+        released = []
+
+        for entry in list(self._receivers.get(receiver_id, {}).values()):
+            if not entry.active:
+                continue
+            if entry.requests:
+                entry.release_when_done = True
+            else:
+                self._forget(entry)
+                released.append(entry.transfer_id)
+
+        return released
+
+    def idle(self, timeout: float) -> List[ScheduledTransfer]:
+        """Admitted transfers without activity for `timeout` seconds"""
+        cutoff = time.monotonic() - timeout
+        return [
+            entry for entry in self._transfers.values()
+            if entry.active and entry.last_activity < cutoff
+        ]
+
+    def get(self, transfer_id: str) -> Optional[ScheduledTransfer]:
+        return self._transfers.get(transfer_id)
+
+    def is_queued(self, transfer_id: str) -> bool:
+        entry = self._transfers.get(transfer_id)
+        return entry is not None and not entry.active
+
+    def position(self, transfer_id: str) -> Optional[int]:
+        """1-based queue position, None if the transfer is not waiting"""
+        entry = self._transfers.get(transfer_id)
+        if entry is None or entry.active:
+            return None
+        for index, queued in enumerate(self.queue(entry.receiver_id)):
+            if queued.transfer_id == transfer_id:
+                return index + 1
+        return None
+
+
+# Global scheduler instance
+transfer_scheduler = TransferScheduler(
+    settings.TRANSFER_QUEUE_POLICY,
+    settings.MAX_ACTIVE_TRANSFERS,
+    settings.TRANSFER_QUEUE_MAX_WAIT
+)
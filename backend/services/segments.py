@@ -0,0 +1,145 @@
+"""
+Segmented download manifests
+Describe every file of a transfer as a list of byte-range segments so
+clients can fetch a file over several parallel connections and verify
+each segment as it arrives
+"""
+
+import hashlib
+import threading
+from email.utils import formatdate
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from backend.core.config import settings
+from backend.services.storage import StoredFile
+
+
+# Segment digest cache: {(transfer_id, path, size, mtime_ns, segment_size): [sha256, ...]}
+_digest_cache: Dict[tuple, List[str]] = {}
+_DIGEST_CACHE_MAX = 4096
+# Filled from worker threads - hashing runs outside the lock
+_digest_lock = threading.Lock()
+
+
+def file_etag(size: int, mtime_ns: int) -> str:
+    """
+    Build a strong validator for a file from its size and modification time
+    """
+    return f'"{size:x}-{mtime_ns:x}"'
+
+
+def resolve_segment_size(requested: Optional[int] = None) -> int:
+    """
+    Clamp a client supplied segment size to the configured bounds
+    """
+    if not requested:
+        return settings.SEGMENT_SIZE
+    return max(settings.MIN_SEGMENT_SIZE, requested)
+
+
+def segment_bounds(size: int, segment_size: int) -> List[Tuple[int, int]]:
+    """
+    Split a file of the given size into inclusive (start, end) byte ranges
+    """
+    return [
+        (start, min(start + segment_size, size) - 1)
+        for start in range(0, size, segment_size)
+    ]
+
+
+def _read_ranges(stored: StoredFile, bounds: List[Tuple[int, int]]) -> Iterator[Iterator[bytes]]:
+    """
+    Yield, for every range, an iterator over its bytes in CHUNK_SIZE pieces
+    """
+    if stored.in_memory:
+        for start, end in bounds:
+            yield iter((stored.data[start:end + 1],))
+        return
+
+    with open(stored.disk_path, 'rb') as f:
+        for start, end in bounds:
+            def chunks(remaining=end - start + 1):
+                while remaining > 0:
+                    chunk = f.read(min(remaining, settings.CHUNK_SIZE))
+                    if not chunk:
+                        return
+                    remaining -= len(chunk)
+                    yield chunk
+            f.seek(start)
+            yield chunks()
+
+
+def segment_digests(transfer_id: str, stored: StoredFile, segment_size: int) -> List[str]:
+    """
+    SHA-256 digest of every segment of a file
+    Blocking - call from a worker thread. Results are cached per file version.
+    """
+    key = (transfer_id, stored.path, stored.size, stored.mtime_ns, segment_size)
+    with _digest_lock:
+        cached = _digest_cache.get(key)
+    if cached is not None:
+        return cached
+
+    digests = []
+    for chunks in _read_ranges(stored, segment_bounds(stored.size, segment_size)):
+        digest = hashlib.sha256()
+        for chunk in chunks:
+            digest.update(chunk)
+        digests.append(digest.hexdigest())
+
+    with _digest_lock:
+        if key not in _digest_cache and len(_digest_cache) >= _DIGEST_CACHE_MAX:
+            # Drop the oldest entry (dicts keep insertion order)
+            _digest_cache.pop(next(iter(_digest_cache)))
+        _digest_cache[key] = digests
+
+    return digests
+
+
+def build_manifest(
+    transfer_id: str,
+    stored_files: List[StoredFile],
+    segment_size: int,
+    checksums: bool = False
+) -> dict:
+    """
+    Build the download manifest for a transfer
+    Blocking when checksums are requested - call from a worker thread.
+
+    Args:
+        transfer_id: Transfer the files belong to
+        stored_files: Files from the storage backend
+        segment_size: Size of each segment in bytes
+        checksums: Include a SHA-256 digest for every segment
+
+    Returns:
+        Manifest with size, validators and segment boundaries per file
+    """
+    files = []
+    total_size = 0
+
+    for stored in stored_files:
+        segments = [
+            {"index": index, "start": start, "end": end}
+            for index, (start, end) in enumerate(segment_bounds(stored.size, segment_size))
+        ]
+
+        if checksums:
+            for segment, digest in zip(segments, segment_digests(transfer_id, stored, segment_size)):
+                segment["sha256"] = digest
+
+        files.append({
+            "name": stored.name,
+            "path": stored.path,
+            "size": stored.size,
+            "etag": file_etag(stored.size, stored.mtime_ns),
+            "lastModified": formatdate(stored.mtime_ns / 1e9, usegmt=True),
+            "segments": segments
+        })
+        total_size += stored.size
+
+    return {
+        "segmentSize": segment_size,
+        "totalSize": total_size,
+        "files": files
+    }
@@ -0,0 +1,379 @@
+"""
+Storage backends
+Where transfer files live. Handlers go through the module-level `storage`
+instance instead of building paths under UPLOAD_DIR themselves.
+
+    disk    - LocalDiskStorage: one directory per transfer under UPLOAD_DIR
+    memory  - MemoryTierStorage: files up to MEMORY_TIER_THRESHOLD are kept
+              in RAM within MEMORY_TIER_BUDGET, everything else (and any
+              overflow) spills to LocalDiskStorage
+"""
+
+import os
+import shutil
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Optional
+
+from fastapi import UploadFile
+
+from backend.core.config import settings
+from backend.services.uploads import is_partial, write_upload
+
+
+class StoredFile:
+    """A file held by a storage backend"""
+
+    def __init__(
+        self,
+        path: str,
+        size: int,
+        mtime_ns: int,
+        disk_path: Optional[Path] = None,
+        data: Optional[bytes] = None
+    ):
+        self.path = path  # Relative path inside the transfer (POSIX separators)
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.disk_path = disk_path  # Set for files on disk
+        self.data = data  # Set for files held in memory
+
+    @property
+    def name(self) -> str:
+        return PurePosixPath(self.path).name
+
+    @property
+    def in_memory(self) -> bool:
+        return self.data is not None
+
+    def location(self, transfer_id: str) -> str:
+        """Human readable location, for metadata listings"""
+        if self.disk_path is not None:
+            return str(self.disk_path)
+        return f"memory://{transfer_id}/{self.path}"
+
+
+def validate_transfer_id(transfer_id: str) -> str:
+    """
+    Reject transfer IDs that could escape the storage root
+    """
+    if not transfer_id or transfer_id in (".", "..") or "/" in transfer_id or "\\" in transfer_id:
+        raise ValueError(f"Invalid transfer ID: {transfer_id}")
+    return transfer_id
+
+
+def normalize_path(relative_path: str) -> str:
+    """
+    Normalize a client supplied relative path
+    Raises ValueError for absolute paths or paths that climb out of the transfer
+    """
+    parts = [
+        part for part in PurePosixPath(relative_path.replace("\\", "/")).parts
+        if part not in ("", ".")
+    ]
+    if not parts or parts[0] == "/" or ".." in parts:
+        raise ValueError(f"Invalid file path: {relative_path}")
+    return "/".join(parts)
+
+
+class StorageBackend(ABC):
+    """Interface implemented by every storage backend"""
+
+    @abstractmethod
+    async def save(
+        self,
+        transfer_id: str,
+        relative_path: str,
+        upload: UploadFile,
+        declared_size: Optional[int] = None
+    ) -> StoredFile:
+        """Store an upload, replacing any file at the same path"""
+
+    @abstractmethod
+    def get(self, transfer_id: str, relative_path: str) -> Optional[StoredFile]:
+        """Look up one file, None if it does not exist"""
+
+    @abstractmethod
+    def scan(self, transfer_id: str) -> Optional[List[StoredFile]]:
+        """
+        List every complete file of a transfer, None if the transfer is unknown
+        May block - call from a worker thread.
+        """
+
+    @abstractmethod
+    def has_transfer(self, transfer_id: str) -> bool:
+        """Whether any file of the transfer is stored"""
+
+    @abstractmethod
+    def delete_transfer(self, transfer_id: str) -> bool:
+        """Remove a transfer's files, True if anything was deleted"""
+
+    @abstractmethod
+    def list_transfers(self) -> List[str]:
+        """IDs of every stored transfer"""
+
+    @abstractmethod
+    def link(
+        self,
+        source_id: str,
+        source_path: str,
+        transfer_id: str,
+        relative_path: str
+    ) -> Optional[StoredFile]:
+        """
+        Make a file of one transfer also appear in another without copying
+        its contents. Returns None if the source file does not exist.
+        May block - call from a worker thread.
+        """
+
+    @abstractmethod
+    def move_transfer(self, source_id: str, transfer_id: str) -> bool:
+        """Rename a transfer, replacing any transfer of the target ID"""
+
+
+class LocalDiskStorage(StorageBackend):
+    """Files stored under a root directory, one subdirectory per transfer"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def transfer_dir(self, transfer_id: str) -> Path:
+        return self.root / validate_transfer_id(transfer_id)
+
+    def _full_path(self, transfer_id: str, relative_path: str) -> Path:
+        transfer_dir = self.transfer_dir(transfer_id).resolve()
+        full_path = (transfer_dir / normalize_path(relative_path)).resolve()
+        # Symlinks must not lead outside the transfer either
+        full_path.relative_to(transfer_dir)
+        return full_path
+
+    def _stored(self, transfer_dir: Path, full_path: Path) -> StoredFile:
+        stat_result = full_path.stat()
+        return StoredFile(
+            full_path.relative_to(transfer_dir).as_posix(),
+            stat_result.st_size,
+            stat_result.st_mtime_ns,
+            disk_path=full_path
+        )
+
+    async def save(self, transfer_id, relative_path, upload, declared_size=None) -> StoredFile:
+        full_path = self._full_path(transfer_id, relative_path)
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+
+        await write_upload(upload, full_path, declared_size)
+
+        return self._stored(self.transfer_dir(transfer_id).resolve(), full_path)
+
+    def get(self, transfer_id, relative_path) -> Optional[StoredFile]:
+        full_path = self._full_path(transfer_id, relative_path)
+        if not full_path.is_file() or is_partial(full_path):
+            return None
+        return self._stored(self.transfer_dir(transfer_id).resolve(), full_path)
+
+    def scan(self, transfer_id) -> Optional[List[StoredFile]]:
+        transfer_dir = self.transfer_dir(transfer_id).resolve()
+        if not transfer_dir.is_dir():
+            return None
+
+        return [
+            self._stored(transfer_dir, file_path)
+            for file_path in sorted(transfer_dir.rglob('*'))
+            # Skip uploads that are still being written
+            if file_path.is_file() and not is_partial(file_path)
+        ]
+
+    def remove(self, transfer_id: str, relative_path: str) -> None:
+        """Delete one file if it exists"""
+        self._full_path(transfer_id, relative_path).unlink(missing_ok=True)
+
+    def has_transfer(self, transfer_id) -> bool:
+        return self.transfer_dir(transfer_id).is_dir()
+
+    def delete_transfer(self, transfer_id) -> bool:
+        transfer_dir = self.transfer_dir(transfer_id)
+        if not transfer_dir.exists():
+            return False
+        shutil.rmtree(transfer_dir)
+        return True
+
+    def list_transfers(self) -> List[str]:
+        if not self.root.exists():
+            return []
+        return [item.name for item in self.root.iterdir() if item.is_dir()]
+
+    def link(self, source_id, source_path, transfer_id, relative_path) -> Optional[StoredFile]:
+        source = self.get(source_id, source_path)
+        if source is None:
+            return None
+
+        full_path = self._full_path(transfer_id, relative_path)
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        full_path.unlink(missing_ok=True)
+
+        # Uploads replace files by rename, so a shared inode is never
+        # modified in place; copy where hard links are not supported
+        try:
+            os.link(source.disk_path, full_path)
+        except OSError:
+            shutil.copy2(source.disk_path, full_path)
+
+        return self._stored(self.transfer_dir(transfer_id).resolve(), full_path)
+
+    def move_transfer(self, source_id, transfer_id) -> bool:
+        source_dir = self.transfer_dir(source_id)
+        if not source_dir.is_dir():
+            return False
+        self.delete_transfer(transfer_id)
+        source_dir.rename(self.transfer_dir(transfer_id))
+        return True
+
+
+class _PrefixedUpload:
+    """Replays bytes already read from an upload before reading the rest"""
+
+    def __init__(self, prefix: bytes, upload: UploadFile):
+        self._prefix = prefix
+        self._upload = upload
+
+    @property
+    def size(self) -> Optional[int]:
+        return self._upload.size
+
+    async def read(self, size: int = -1) -> bytes:
+        if self._prefix:
+            if size < 0 or size >= len(self._prefix):
+                chunk, self._prefix = self._prefix, b""
+            else:
+                chunk, self._prefix = self._prefix[:size], self._prefix[size:]
+            return chunk
+        return await self._upload.read(size)
+
+
+class MemoryTierStorage(StorageBackend):
+    """
+    Small files in RAM, everything else on disk
+
+    Saves small files from inode churn and fsyncs on slow media (SD cards).
+    A file goes to RAM only if it is at most `threshold` bytes and fits in
+    what is left of `budget`; otherwise it spills to the disk backend.
+    """
+
+    def __init__(self, disk: LocalDiskStorage, threshold: int, budget: int):
+        self.disk = disk
+        self.threshold = threshold
+        self.budget = budget
+        self.used = 0
+
+        # {transfer_id: {relative_path: StoredFile}}
+        self._files: Dict[str, Dict[str, StoredFile]] = {}
+
+    def _forget(self, transfer_id: str, relative_path: str):
+        stored = self._files.get(transfer_id, {}).pop(relative_path, None)
+        if stored is not None:
+            self.used -= stored.size
+
+    async def save(self, transfer_id, relative_path, upload, declared_size=None) -> StoredFile:
+        validate_transfer_id(transfer_id)
+        relative_path = normalize_path(relative_path)
+        self._forget(transfer_id, relative_path)
+
+        # Only buffer when the declared size (if any) could fit
+        room = max(min(self.threshold, self.budget - self.used), 0)
+        if declared_size is not None and declared_size > room:
+            return await self.disk.save(transfer_id, relative_path, upload, declared_size)
+
+        # Read at most one byte past the limit to find out if the file fits
+        chunks = []
+        buffered = 0
+        while buffered <= room:
+            chunk = await upload.read(min(settings.CHUNK_SIZE, room + 1 - buffered))
+            if not chunk:
+                break
+            chunks.append(chunk)
+            buffered += len(chunk)
+        data = b"".join(chunks)
+
+        # Budget may have shrunk while we were reading
+        if buffered > room or self.used + buffered > self.budget:
+            return await self.disk.save(
+                transfer_id, relative_path, _PrefixedUpload(data, upload), declared_size
+            )
+
+        # A memory copy replaces any spilled copy of the same path
+        self.disk.remove(transfer_id, relative_path)
+
+        stored = StoredFile(relative_path, len(data), time.time_ns(), data=data)
+        self._files.setdefault(transfer_id, {})[relative_path] = stored
+        self.used += stored.size
+
+        return stored
+
+    def get(self, transfer_id, relative_path) -> Optional[StoredFile]:
+        stored = self._files.get(validate_transfer_id(transfer_id), {}).get(normalize_path(relative_path))
+        if stored is not None:
+            return stored
+        return self.disk.get(transfer_id, relative_path)
+
+    def scan(self, transfer_id) -> Optional[List[StoredFile]]:
+        on_disk = self.disk.scan(transfer_id)
+        in_memory = self._files.get(transfer_id)
+
+        if on_disk is None and not in_memory:
+            return None
+
+        files = {stored.path: stored for stored in on_disk or []}
+        files.update(in_memory or {})
+        return [files[path] for path in sorted(files)]
+
+    def has_transfer(self, transfer_id) -> bool:
+        return bool(self._files.get(transfer_id)) or self.disk.has_transfer(transfer_id)
+
+    def delete_transfer(self, transfer_id) -> bool:
+        in_memory = self._files.pop(validate_transfer_id(transfer_id), {})
+        self.used -= sum(stored.size for stored in in_memory.values())
+        return self.disk.delete_transfer(transfer_id) or bool(in_memory)
+
+    def list_transfers(self) -> List[str]:
+        transfers = set(self.disk.list_transfers())
+        transfers.update(transfer_id for transfer_id, files in self._files.items() if files)
+        return sorted(transfers)
+
+    def link(self, source_id, source_path, transfer_id, relative_path) -> Optional[StoredFile]:
+        source = self._files.get(validate_transfer_id(source_id), {}).get(normalize_path(source_path))
+        if source is None:
+            return self.disk.link(source_id, source_path, transfer_id, relative_path)
+
+        # Bytes are immutable - both transfers share the same buffer
+        relative_path = normalize_path(relative_path)
+        self._forget(validate_transfer_id(transfer_id), relative_path)
+        self.disk.remove(transfer_id, relative_path)
+
+        stored = StoredFile(relative_path, source.size, source.mtime_ns, data=source.data)
+        self._files.setdefault(transfer_id, {})[relative_path] = stored
+        self.used += stored.size
+
+        return stored
+
+    def move_transfer(self, source_id, transfer_id) -> bool:
+        in_memory = self._files.pop(validate_transfer_id(source_id), {})
+        self.delete_transfer(transfer_id)
+        if in_memory:
+            self._files[transfer_id] = in_memory
+        return self.disk.move_transfer(source_id, transfer_id) or bool(in_memory)
+
+
+def create_storage() -> StorageBackend:
+    """
+    Build the backend selected by STORAGE_BACKEND
+    """
+    disk = LocalDiskStorage(settings.UPLOAD_DIR)
+
+    if settings.STORAGE_BACKEND == "memory":
+        return MemoryTierStorage(disk, settings.MEMORY_TIER_THRESHOLD, settings.MEMORY_TIER_BUDGET)
+
+    return disk
+
+
+# Global storage instance
+storage = create_storage()
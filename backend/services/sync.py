@@ -0,0 +1,219 @@
+"""
+Incremental folder sync
+Remembers, for each sender, receiver and folder, the last copy of the
+folder the receiver downloaded completely. The copy is kept in storage as
+a snapshot transfer (sync_<random id>) instead of being deleted.
+
+Before re-sending the folder the sender posts its file list (path, size,
+mtime and optionally a hash). Files the snapshot holds in the same version
+are linked into the new transfer, so only new and changed files are
+uploaded while the receiver still downloads the complete folder. Once the
+new transfer has been downloaded it becomes the folder's snapshot.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from backend.core.config import settings
+from backend.services.storage import StoredFile, normalize_path, storage
+
+
+SNAPSHOT_PREFIX = "sync_"
+
+# (sender_id, receiver_id, folder)
+SyncKey = Tuple[str, str, str]
+
+
+class SyncSnapshot:
+    """The copy of a folder a receiver last downloaded"""
+
+    def __init__(self, snapshot_id: str, files: Dict[str, dict]):
+        self.snapshot_id = snapshot_id
+        self.files = files  # {path: {"size", "mtime", "hash"}} as declared by the sender
+        self.updated_at = time.time()
+
+
+class SyncRegistry:
+    """
+    Folder snapshots and the transfers that will replace them
+    Methods that delete snapshots block on storage - call them from a
+    worker thread. The lock only guards the registry, not the deletes.
+    """
+
+    def __init__(self, max_snapshots: int, max_age_hours: float):
+        self.max_snapshots = max_snapshots  # 0 disables incremental sync
+        self.max_age_hours = max_age_hours
+
+        # Least recently updated first
+        self._snapshots: "OrderedDict[SyncKey, SyncSnapshot]" = OrderedDict()
+        # Transfers re-sending a folder: {transfer_id: (key, {path: entry}, diffed_at)}
+        self._pending: Dict[str, Tuple[SyncKey, Dict[str, dict], float]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unchanged(previous: dict, current: dict) -> bool:
+        if previous["size"] != current["size"]:
+            return False
+        if previous.get("hash") and current.get("hash"):
+            return previous["hash"] == current["hash"]
+        return previous.get("mtime") is not None and previous.get("mtime") == current.get("mtime")
+
+    def diff(
+        self,
+        transfer_id: str,
+        sender_id: str,
+        receiver_id: str,
+        folder: str,
+        files: List[dict]
+    ) -> dict:
+        """
+        Compare a folder's file list with the receiver's previous copy
+        and register the transfer as the folder's next version
+
+        Returns:
+            {"snapshotId", "upload", "reuse", "removed"} - paths to upload,
+            paths unchanged in the snapshot, and snapshot paths no longer
+            in the folder
+        Raises ValueError for invalid paths.
+        """
+        current = {normalize_path(entry["path"]): entry for entry in files}
+
+        if not self.max_snapshots:
+            return {"snapshotId": None, "upload": sorted(current), "reuse": [], "removed": []}
+
+        self.prune()
+        key = (sender_id, receiver_id, folder)
+
+        with self._lock:
+            self._pending[transfer_id] = (key, current, time.time())
+            snapshot = self._snapshots.get(key)
+
+        if snapshot is None:
+            return {"snapshotId": None, "upload": sorted(current), "reuse": [], "removed": []}
+
+        upload, reuse = [], []
+        for path in sorted(current):
+            previous = snapshot.files.get(path)
+            if previous is not None and self._unchanged(previous, current[path]):
+                reuse.append(path)
+            else:
+                upload.append(path)
+
+        return {
+            "snapshotId": snapshot.snapshot_id,
+            "upload": upload,
+            "reuse": reuse,
+            "removed": sorted(snapshot.files.keys() - current.keys())
+        }
+
+    @staticmethod
+    def link(snapshot_id: str, transfer_id: str, paths: List[str]) -> Tuple[List[StoredFile], List[str]]:
+        """
+        Link unchanged files from a snapshot into a transfer
+        Blocking - call from a worker thread.
+
+        Returns:
+            (linked files, paths missing from the snapshot)
+        """
+        linked, missing = [], []
+        for path in paths:
+            stored = storage.link(snapshot_id, path, transfer_id, path)
+            if stored is None:
+                missing.append(path)
+            else:
+                linked.append(stored)
+        return linked, missing
+
+    def promote(self, transfer_id: str, delivered: Dict[str, int]) -> bool:
+        """
+        Keep a downloaded transfer as its folder's new snapshot
+
+        Args:
+            delivered: {path: size} of the files the receiver got
+
+        Returns:
+            True if the transfer's files were kept, False if the transfer
+            did not re-send a synced folder
+        """
+        with self._lock:
+            pending = self._pending.pop(transfer_id, None)
+        if pending is None:
+            return False
+
+        key, declared, _ = pending
+        # Random, so snapshots cannot be reached through the transfer endpoints
+        snapshot_id = f"{SNAPSHOT_PREFIX}{uuid.uuid4().hex}"
+        if not storage.move_transfer(transfer_id, snapshot_id):
+            return False
+
+        # Remember only what arrived as declared - anything else is re-sent next time
+        files = {
+            path: entry for path, entry in declared.items()
+            if delivered.get(path) == entry["size"]
+        }
+
+        # Transfers that linked files from the old snapshot keep their links
+        with self._lock:
+            previous = self._snapshots.pop(key, None)
+            self._snapshots[key] = SyncSnapshot(snapshot_id, files)
+        if previous is not None:
+            storage.delete_transfer(previous.snapshot_id)
+        print(f"🔁 Kept {transfer_id} as sync snapshot {snapshot_id} ({len(files)} files)")
+
+        self.prune()
+        return True
+
+    def discard(self, transfer_id: str):
+        """Forget a transfer that was deleted before being downloaded"""
+        with self._lock:
+            self._pending.pop(transfer_id, None)
+
+    def prune(self) -> int:
+        """
+        Delete snapshots older than max_age_hours, then the least recently
+        updated ones beyond max_snapshots. Transfers diffed that long ago
+        and never delivered are forgotten too.
+
+        Returns:
+            Number of snapshots deleted
+        """
+        cutoff = time.time() - self.max_age_hours * 3600
+
+        with self._lock:
+            for transfer_id in [tid for tid, pending in self._pending.items() if pending[2] < cutoff]:
+                del self._pending[transfer_id]
+
+            expired = [key for key, snapshot in self._snapshots.items() if snapshot.updated_at < cutoff]
+            overflow = len(self._snapshots) - len(expired) - self.max_snapshots
+            if overflow > 0:
+                expired += [key for key in self._snapshots if key not in expired][:overflow]
+
+            snapshot_ids = [self._snapshots.pop(key).snapshot_id for key in expired]
+
+        for snapshot_id in snapshot_ids:
+            storage.delete_transfer(snapshot_id)
+
+        return len(snapshot_ids)
+
+    def remove_orphans(self) -> int:
+        """
+        Delete snapshot transfers left in storage by a previous run
+        (their file metadata was only kept in memory)
+        """
+        with self._lock:
+            known = {snapshot.snapshot_id for snapshot in self._snapshots.values()}
+        removed = 0
+
+        for transfer_id in storage.list_transfers():
+            if transfer_id.startswith(SNAPSHOT_PREFIX) and transfer_id not in known:
+                storage.delete_transfer(transfer_id)
+                removed += 1
+
+        return removed
+
+
+# Global registry instance
+sync_registry = SyncRegistry(settings.SYNC_MAX_SNAPSHOTS, settings.SYNC_SNAPSHOT_HOURS)
@@ -0,0 +1,123 @@
+"""
+Upload write path
+Streams uploads into a preallocated temp file next to the destination and
+atomically renames it into place once complete, so readers never see a
+half-written file. Durability is selected with UPLOAD_DURABILITY:
+
+    none      - no fsync, fastest (default)
+    finalize  - fsync the file and its directory before the upload completes
+    periodic  - also fsync every UPLOAD_FSYNC_INTERVAL bytes while writing
+"""
+
+import os
+import uuid
+from pathlib import Path
+from typing import Optional
+
+import aiofiles
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+from backend.core.config import settings
+
+
+PART_SUFFIX = ".part"
+
+
+def is_partial(path: Path) -> bool:
+    """
+    Whether a path is an in-progress upload temp file
+    """
+    return path.name.endswith(PART_SUFFIX)
+
+
+def _temp_path_for(final_path: Path) -> Path:
+    return final_path.with_name(f".{final_path.name}.{uuid.uuid4().hex[:8]}{PART_SUFFIX}")
+
+
+def _preallocate(fd: int, size: int) -> None:
+    """
+    Reserve disk space up front so large files are laid out contiguously
+    """
+    if not hasattr(os, "posix_fallocate"):
+        return
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except OSError:
+        # Filesystem without fallocate support - write without reserving
+        pass
+
+
+def _fsync_directory(directory: Path) -> None:
+    """
+    Persist a rename by syncing the parent directory (POSIX only)
+    """
+    if os.name != "posix":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+async def write_upload(upload: UploadFile, final_path: Path, declared_size: Optional[int] = None) -> int:
+    """
+    Write an uploaded file to its final path atomically
+
+    Args:
+        upload: Incoming upload
+        final_path: Destination path (parent must exist)
+        declared_size: Size announced by the client, used to preallocate
+            when no larger than the part actually received
+
+    Returns:
+        Number of bytes written
+    """
+    durability = settings.UPLOAD_DURABILITY
+    temp_path = _temp_path_for(final_path)
+    written = 0
+
+    # The declared size is the client's word - never reserve more disk than
+    # the request really brought (unknown size: no preallocation)
+    received = getattr(upload, "size", None)
+    if not declared_size or received is None or declared_size > received:
+        declared_size = None
+
+    try:
+        async with aiofiles.open(temp_path, 'wb') as f:
+            if declared_size:
+                await run_in_threadpool(_preallocate, f.fileno(), declared_size)
+
+            unsynced = 0
+            while True:
+                chunk = await upload.read(settings.CHUNK_SIZE)
+                if not chunk:
+                    break
+                await f.write(chunk)
+                written += len(chunk)
+                unsynced += len(chunk)
+
+                if durability == "periodic" and unsynced >= settings.UPLOAD_FSYNC_INTERVAL:
+                    await f.flush()
+                    await run_in_threadpool(os.fsync, f.fileno())
+                    unsynced = 0
+
+            # Preallocation extended the file - drop the unused tail
+            if declared_size and written < declared_size:
+                await f.truncate(written)
+
+            if durability != "none":
+                await f.flush()
+                await run_in_threadpool(os.fsync, f.fileno())
+
+        await run_in_threadpool(os.replace, temp_path, final_path)
+
+        if durability != "none":
+            await run_in_threadpool(_fsync_directory, final_path.parent)
+
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+    return written
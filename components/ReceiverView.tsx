@@ -2,7 +2,7 @@ import React, { useEffect, useState } from 'react';
 import { ArrowLeft, Wifi, Download, ShieldCheck, FileText, X } from 'lucide-react';
 import { UserProfile } from '../types';
 import { WebSocketClient } from '../utils/websocket';
-import { API_ENDPOINTS } from '../utils/api';
+import { API_ENDPOINTS, TransferTuning, negotiateTransfer } from '../utils/api';
 import { formatBytes } from '../utils/helpers';
 import DownloadProgress from './DownloadProgress';
 
@@ -17,6 +17,9 @@ interface IncomingTransfer {
   from: string;
   fromName?: string;
   files: any[];
+  fileCount?: number;
+  totalSize?: number;
+  progressive?: boolean;
 }
 
 interface DownloadStatus {
@@ -33,36 +36,85 @@ const ReceiverView: React.FC<ReceiverViewProps> = ({ onBack, user, wsClient }) =
   const [isDownloading, setIsDownloading] = useState(false);
   
   useEffect(() => {
+    const onTransferRequest = (message: any) => {
+      setIncomingTransfers(prev => [...prev, {
+        transferId: message.transferId,
+        from: message.from,
+        fromName: message.fromName,
+        files: message.files || [],
+        fileCount: message.fileCount,
+        totalSize: message.totalSize,
+        progressive: message.progressive
+      }]);
+    };
+    
+    // The sender gave up (e.g. an upload failed)
+    const onTransferCancelled = (message: any) => {
+      setIncomingTransfers(prev => prev.filter(t => t.transferId !== message.transferId));
+    };
+    
     if (wsClient) {
-      wsClient.on('transfer_request', (message: any) => {
-        setIncomingTransfers(prev => [...prev, {
-          transferId: message.transferId,
-          from: message.from,
-          fromName: message.fromName,
-          files: message.files || []
-        }]);
-      });
+      wsClient.on('transfer_request', onTransferRequest);
+      wsClient.on('transfer_cancelled', onTransferCancelled);
     }
     
     return () => {
       if (wsClient) {
-        wsClient.off('transfer_request', () => {});
+        wsClient.off('transfer_request', onTransferRequest);
+        wsClient.off('transfer_cancelled', onTransferCancelled);
       }
     };
   }, [wsClient]);
   
-  const downloadFile = async (transferId: string, file: any, index: number) => {
+  // Fetch a file as chunkSize byte ranges over `parallelism` connections
+  const fetchSegments = async (
+    transferId: string,
+    fileName: string,
+    size: number,
+    tuning: TransferTuning,
+    onProgress: (bytes: number) => void
+  ) => {
+    const count = Math.ceil(size / tuning.chunkSize);
+    const parts: Blob[] = new Array(count);
+    let next = 0;
+    let received = 0;
+    
+    const worker = async () => {
+      while (next < count) {
+        const part = next++;
+        const start = part * tuning.chunkSize;
+        const end = Math.min(start + tuning.chunkSize, size) - 1;
+        
+        const response = await fetch(API_ENDPOINTS.SEGMENT(transferId, fileName), {
+          headers: { Range: `bytes=${start}-${end}` }
+        });
+        if (response.status !== 206) throw new Error('Segment download failed');
+        
+        parts[part] = await response.blob();
+        received += end - start + 1;
+        onProgress(received);
+      }
+    };
+    
+    await Promise.all(Array.from({ length: Math.min(tuning.parallelism, count) }, worker));
+    return parts;
+  };
+  
+  const downloadFile = async (transferId: string, file: any, index: number, tuning: TransferTuning) => {
     const fileName = file.path || file.name;
     
     try {
-      const response = await fetch(
+      const segmented = tuning.parallelism > 1 && file.size > tuning.chunkSize;
+      const response = segmented ? null : await fetch(
         API_ENDPOINTS.DOWNLOAD_FILE(transferId, fileName),
         { method: 'GET' }
       );
       
-      if (!response.ok) throw new Error('Download failed');
+      if (response && !response.ok) throw new Error('Download failed');
       
-      const totalBytes = parseInt(response.headers.get('content-length') || '0');
+      const totalBytes = response
+        ? parseInt(response.headers.get('content-length') || '0')
+        : file.size;
       let downloadedBytes = 0;
       
       // Create download status
@@ -77,31 +129,41 @@ const ReceiverView: React.FC<ReceiverViewProps> = ({ onBack, user, wsClient }) =
       setDownloadStatuses(prev => [...prev, status]);
       const statusIndex = downloadStatuses.length;
       
-      const reader = response.body?.getReader();
-      const chunks: Uint8Array[] = [];
+      const updateProgress = () => {
+        const progress = totalBytes > 0 ? (downloadedBytes / totalBytes) * 100 : 0;
+        setDownloadStatuses(prev => {
+          const newStatuses = [...prev];
+          if (newStatuses[statusIndex]) {
+            newStatuses[statusIndex] = {
+              ...newStatuses[statusIndex],
+              progress,
+              downloadedBytes
+            };
+          }
+          return newStatuses;
+        });
+      };
+      
+      const chunks: BlobPart[] = [];
       
-      if (reader) {
-        while (true) {
-          const { done, value } = await reader.read();
-          
-          if (done) break;
-          
-          chunks.push(value);
-          downloadedBytes += value.length;
-          
-          // Update progress
-          const progress = totalBytes > 0 ? (downloadedBytes / totalBytes) * 100 : 0;
-          setDownloadStatuses(prev => {
-            const newStatuses = [...prev];
-            if (newStatuses[statusIndex]) {
-              newStatuses[statusIndex] = {
-                ...newStatuses[statusIndex],
-                progress,
-                downloadedBytes
-              };
-            }
-            return newStatuses;
-          });
+      if (!response) {
+        chunks.push(...await fetchSegments(transferId, fileName, file.size, tuning, bytes => {
+          downloadedBytes = bytes;
+          updateProgress();
+        }));
+      } else {
+        const reader = response.body?.getReader();
+        
+        if (reader) {
+          while (true) {
+            const { done, value } = await reader.read();
+            
+            if (done) break;
+            
+            chunks.push(value);
+            downloadedBytes += value.length;
+            updateProgress();
+          }
         }
       }
       
@@ -141,7 +203,94 @@ const ReceiverView: React.FC<ReceiverViewProps> = ({ onBack, user, wsClient }) =
     }
   };
   
+  // Follow a progressive transfer: download files as the sender finishes
+  // uploading them. Listeners are registered before accepting so no
+  // file_available message can be missed.
+  const trackProgressiveTransfer = (transferId: string, tuning: TransferTuning) => {
+    const queue: any[] = [];
+    const seen = new Set<string>();
+    let expected: number | null = null;
+    let downloaded = 0;
+    let pumping = false;
+    let started = false;
+    let cancelled = false;
+    // Resolves to false if the sender cancelled the transfer
+    let resolveDone: (completed: boolean) => void = () => {};
+    const done = new Promise<boolean>(resolve => { resolveDone = resolve; });
+
+    const enqueue = (file: any) => {
+      if (seen.has(file.path)) return;
+      seen.add(file.path);
+      queue.push(file);
+    };
+
+    const unsubscribe = () => {
+      wsClient?.off('file_available', onFileAvailable);
+      wsClient?.off('transfer_upload_complete', onUploadComplete);
+      wsClient?.off('transfer_cancelled', onCancelled);
+    };
+
+    const finishIfDone = () => {
+      if (started && !pumping && queue.length === 0 && expected !== null && downloaded >= expected) {
+        unsubscribe();
+        resolveDone(true);
+      }
+    };
+
+    const pump = async () => {
+      if (!started || pumping) return;
+      pumping = true;
+      while (queue.length > 0 && !cancelled) {
+        const file = queue.shift();
+        await downloadFile(transferId, file, downloaded, tuning);
+        downloaded++;
+      }
+      pumping = false;
+      finishIfDone();
+    };
+
+    const onFileAvailable = (message: any) => {
+      if (message.transferId !== transferId) return;
+      enqueue(message.file);
+      pump();
+    };
+
+    const onUploadComplete = (message: any) => {
+      if (message.transferId !== transferId) return;
+      expected = message.fileCount;
+      finishIfDone();
+    };
+
+    // The sender deleted the transfer - nothing more will arrive
+    const onCancelled = (message: any) => {
+      if (message.transferId !== transferId) return;
+      cancelled = true;
+      queue.length = 0;
+      unsubscribe();
+      resolveDone(false);
+    };
+
+    wsClient?.on('file_available', onFileAvailable);
+    wsClient?.on('transfer_upload_complete', onUploadComplete);
+    wsClient?.on('transfer_cancelled', onCancelled);
+
+    return {
+      run: (initialFiles: any[], uploadComplete: boolean) => {
+        initialFiles.forEach(enqueue);
+        if (uploadComplete && expected === null) expected = seen.size;
+        started = true;
+        pump();
+        finishIfDone();
+        return done;
+      },
+      cancel: unsubscribe
+    };
+  };
+
   const handleAcceptTransfer = async (transfer: IncomingTransfer) => {
+    const tuning = await negotiateTransfer(user.id, 'download');
+    const tracker = transfer.progressive ? trackProgressiveTransfer(transfer.transferId, tuning) : null;
+    
     try {
       setIsDownloading(true);
       
@@ -155,9 +304,18 @@ const ReceiverView: React.FC<ReceiverViewProps> = ({ onBack, user, wsClient }) =
       });
       
       if (response.ok) {
-        // Download each file individually
-        for (let i = 0; i < transfer.files.length; i++) {
-          await downloadFile(transfer.transferId, transfer.files[i], i);
+        if (tracker) {
+          // Start with what is already uploaded, then follow the sender
+          const accepted = await response.json();
+          if (!await tracker.run(accepted.files || [], accepted.uploadComplete)) {
+            setIsDownloading(false);
+            return;
+          }
+        } else {
+          // Download each file individually
+          for (let i = 0; i < transfer.files.length; i++) {
+            await downloadFile(transfer.transferId, transfer.files[i], i, tuning);
+          }
         }
         
         // Remove from incoming transfers after all downloads complete
@@ -165,8 +323,12 @@ const ReceiverView: React.FC<ReceiverViewProps> = ({ onBack, user, wsClient }) =
           setIncomingTransfers(prev => prev.filter(t => t.transferId !== transfer.transferId));
           setIsDownloading(false);
         }, 2000);
+      } else {
+        tracker?.cancel();
+        setIsDownloading(false);
       }
     } catch (error) {
+      tracker?.cancel();
       console.error('Failed to accept transfer:', error);
       alert('Failed to accept transfer');
       setIsDownloading(false);
@@ -260,7 +422,7 @@ const ReceiverView: React.FC<ReceiverViewProps> = ({ onBack, user, wsClient }) =
                       {transfer.fromName || 'Unknown Sender'}
                     </h4>
                     <p className="text-sm text-slate-400">
-                      {transfer.files.length} {transfer.files.length === 1 ? 'file' : 'files'} • {formatBytes(getTotalSize(transfer.files))}
+                      {transfer.fileCount ?? transfer.files.length} {(transfer.fileCount ?? transfer.files.length) === 1 ? 'file' : 'files'} • {formatBytes(transfer.totalSize ?? getTotalSize(transfer.files))}
                     </p>
                   </div>
                 </div>
@@ -3,7 +3,7 @@ import { ArrowLeft, Upload, File, Folder, X, CheckCircle2, AlertCircle, Send as
 import { FileItem, UserProfile } from '../types';
 import { formatBytes } from '../utils/helpers';
 import { WebSocketClient } from '../utils/websocket';
-import { API_ENDPOINTS } from '../utils/api';
+import { API_ENDPOINTS, negotiateTransfer } from '../utils/api';
 
 interface SenderViewProps {
   onBack: () => void;
@@ -86,52 +86,103 @@ const SenderView: React.FC<SenderViewProps> = ({ onBack, user, wsClient }) => {
       return;
     }
 
+    // Generate transfer ID
+    const transferId = `transfer_${Date.now()}_${Math.random().toString(36).substr(2, 9)}`;
+
     try {
       setUploading(true);
       setUploadProgress(0);
-
-      // Generate transfer ID
-      const transferId = `transfer_${Date.now()}_${Math.random().toString(36).substr(2, 9)}`;
       
-      // Upload files one by one
-      const totalFiles = files.length;
-      for (let i = 0; i < files.length; i++) {
-        const file = files[i];
-        const formData = new FormData();
-        formData.append('file', file);
-        formData.append('sender_id', user.id);
-        formData.append('transfer_id', transferId);
-        
-        // Add relative path if it exists (for folders)
-        if ((file as any).webkitRelativePath) {
-          formData.append('relative_path', (file as any).webkitRelativePath);
+      // Re-sent folders: skip files the receiver's previous copy already has
+      let filesToUpload = files;
+      const folder = mode === 'FOLDER' ? ((files[0] as any)?.webkitRelativePath || '').split('/')[0] : '';
+      if (folder) {
+        try {
+          const diffResponse = await fetch(API_ENDPOINTS.DIFF_TRANSFER(transferId), {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+              senderId: user.id,
+              receiverId: selectedReceiver,
+              folder,
+              files: files.map(file => ({
+                path: (file as any).webkitRelativePath,
+                size: file.size,
+                mtime: file.lastModified,
+              })),
+            }),
+          });
+          if (diffResponse.ok) {
+            const diff = await diffResponse.json();
+            const upload = new Set<string>(diff.upload);
+            filesToUpload = files.filter(file => upload.has((file as any).webkitRelativePath));
+          }
+        } catch (error) {
+          // Fall back to uploading everything
+          console.warn('Folder diff failed:', error);
         }
-
-        const uploadResponse = await fetch(API_ENDPOINTS.UPLOAD_FILE, {
-          method: 'POST',
-          body: formData,
-        });
-
-        if (!uploadResponse.ok) throw new Error(`Failed to upload ${file.name}`);
-        
-        // Update progress
-        setUploadProgress(Math.round(((i + 1) / totalFiles) * 80));
       }
-
-      // Initiate transfer
+      
+      // Initiate first so the receiver can download each file as soon as it is uploaded
       const transferData = new FormData();
       transferData.append('sender_id', user.id);
       transferData.append('receiver_id', selectedReceiver);
       transferData.append('transfer_id', transferId);
+      transferData.append('progressive', 'true');
+      transferData.append('total_size', String(files.reduce((sum, file) => sum + file.size, 0)));
+      transferData.append('file_count', String(files.length));
 
       const transferResponse = await fetch(API_ENDPOINTS.INITIATE_TRANSFER, {
         method: 'POST',
         body: transferData,
       });
       
+      if (!transferResponse.ok) throw new Error('Failed to initiate transfer');
+      
+      // Upload as many files at once as the server recommends for this link
+      const { parallelism } = await negotiateTransfer(user.id, 'upload');
+      const totalFiles = filesToUpload.length;
+      let next = 0;
+      let uploaded = 0;
+      
+      const uploadNext = async () => {
+        while (next < totalFiles) {
+          const file = filesToUpload[next++];
+          const formData = new FormData();
+          formData.append('file', file);
+          formData.append('sender_id', user.id);
+          formData.append('transfer_id', transferId);
+          formData.append('file_size', String(file.size));
+          
+          // Add relative path if it exists (for folders)
+          if ((file as any).webkitRelativePath) {
+            formData.append('relative_path', (file as any).webkitRelativePath);
+          }
+
+          // transfer_id in the URL too, so the server sees the upload as activity while it streams
+          const uploadResponse = await fetch(`${API_ENDPOINTS.UPLOAD_FILE}?transfer_id=${encodeURIComponent(transferId)}`, {
+            method: 'POST',
+            body: formData,
+          });
+
+          if (!uploadResponse.ok) throw new Error(`Failed to upload ${file.name}`);
+          
+          // Update progress
+          uploaded++;
+          setUploadProgress(Math.round((uploaded / totalFiles) * 80));
+        }
+      };
+      
+      await Promise.all(Array.from({ length: Math.min(parallelism, totalFiles) }, uploadNext));
+
+      // Tell the receiver no more files are coming
+      const completeResponse = await fetch(API_ENDPOINTS.COMPLETE_TRANSFER(transferId), {
+        method: 'POST',
+      });
+      
       setUploadProgress(100);
       
-      if (transferResponse.ok) {
+      if (completeResponse.ok) {
         alert('Files sent successfully!');
         setFiles([]);
         setSelectedReceiver(null);
@@ -139,6 +190,10 @@ const SenderView: React.FC<SenderViewProps> = ({ onBack, user, wsClient }) => {
       
     } catch (error) {
       console.error('Upload error:', error);
+      
+      // Don't leave a half-sent transfer behind (also tells the receiver)
+      fetch(API_ENDPOINTS.DELETE_TRANSFER(transferId), { method: 'DELETE' }).catch(() => {});
+      
       alert('Failed to send files. Please try again.');
     } finally {
       setUploading(false);
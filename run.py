@@ -3,6 +3,12 @@ Main entry point for WL-Drop server
 Run this script to start the server
 """
 
+import time
+
+# Taken first so the startup report covers interpreter-level imports
+_PROCESS_START = time.perf_counter()
+
+import errno
 import sys
 import os
 import argparse
@@ -11,10 +17,17 @@ from pathlib import Path
 # Add backend to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-import uvicorn
 from backend.core.config import settings
+from backend.core.launch import (
+    PROFILES, create_listen_socket, effective_buffer_sizes, hypercorn_config,
+    parse_size, resolve_options, uvicorn_kwargs
+)
+from backend.core.startup import startup_timer
 from backend.core.utils import get_local_ip
 
+startup_timer.start(_PROCESS_START)
+startup_timer.mark("imports")
+
 # ANSI color codes for terminal
 class Colors:
     HEADER = '\033[95m'
@@ -51,10 +64,30 @@ def print_help():
     {Colors.OKGREEN}-p, --port PORT{Colors.ENDC}     Specify port (default: 8000)
     {Colors.OKGREEN}--host HOST{Colors.ENDC}         Specify host (default: 0.0.0.0)
 
+{Colors.BOLD}PERFORMANCE:{Colors.ENDC}
+    {Colors.OKGREEN}--profile NAME{Colors.ENDC}      Launch profile: default, throughput, lowmem
+    {Colors.OKGREEN}--loop LOOP{Colors.ENDC}         Event loop: auto, uvloop, asyncio
+    {Colors.OKGREEN}--http PARSER{Colors.ENDC}       HTTP parser: auto, httptools, h11
+    {Colors.OKGREEN}--backlog N{Colors.ENDC}         Listen backlog (pending connections)
+    {Colors.OKGREEN}--keep-alive SEC{Colors.ENDC}    Keep-alive timeout in seconds
+    {Colors.OKGREEN}--h11-max-event-size SIZE{Colors.ENDC}  h11 incomplete event buffer limit
+    {Colors.OKGREEN}--sndbuf SIZE{Colors.ENDC}       Socket send buffer (e.g. 4M)
+    {Colors.OKGREEN}--rcvbuf SIZE{Colors.ENDC}       Socket receive buffer (e.g. 4M)
+    {Colors.OKGREEN}--limit-concurrency N{Colors.ENDC}  Max concurrent connections
+    {Colors.OKGREEN}--self-test{Colors.ENDC}         Print the effective configuration and exit
+
+{Colors.BOLD}HTTP/2:{Colors.ENDC}
+    {Colors.OKGREEN}--server NAME{Colors.ENDC}       Server: uvicorn (HTTP/1.1) or hypercorn (HTTP/2)
+    {Colors.OKGREEN}--certfile PATH{Colors.ENDC}     TLS certificate (browsers only speak HTTP/2 over TLS)
+    {Colors.OKGREEN}--keyfile PATH{Colors.ENDC}      TLS private key
+    {Colors.OKGREEN}--h2-max-streams N{Colors.ENDC}  Concurrent HTTP/2 streams per connection
+
 {Colors.BOLD}EXAMPLES:{Colors.ENDC}
     {Colors.OKCYAN}wl-drop{Colors.ENDC}                    Start server on default port 8000
     {Colors.OKCYAN}wl-drop -p 3000{Colors.ENDC}            Start server on port 3000
     {Colors.OKCYAN}wl-drop --host 192.168.1.10{Colors.ENDC} Start server on specific IP
+    {Colors.OKCYAN}wl-drop --profile throughput{Colors.ENDC} Tune for gigabit LAN transfers
+    {Colors.OKCYAN}wl-drop --server hypercorn{Colors.ENDC}  Serve HTTP/2 (requires hypercorn)
 
 {Colors.BOLD}DESCRIPTION:{Colors.ENDC}
     WL-Drop is a simple and secure local file sharing server.
@@ -84,6 +117,48 @@ Copyright (c) 2025 WL-Drop Contributors
 License: MIT
 """)
 
+def print_self_test(options):
+    """Print the loop, parser and buffer configuration in effect"""
+    sndbuf, rcvbuf = effective_buffer_sizes(options)
+    
+    def requested(value):
+        return value if value else "OS default"
+    
+    print(f"""
+{Colors.BOLD}🔧 WL-Drop launch configuration{Colors.ENDC}
+    Profile:          {Colors.OKCYAN}{options['profile']}{Colors.ENDC}
+    Server:           {options['server']} (requested: {options['requested_server']})
+    Event loop:       {options['loop']} (requested: {options['requested_loop']})
+    HTTP parser:      {options['http']} (requested: {options['requested_http']})
+    Listen backlog:   {options['backlog']}
+    Keep-alive:       {options['keep_alive']}s
+    h11 event limit:  {requested(options['h11_max_event_size'])}
+    Concurrency cap:  {options['limit_concurrency'] or 'none'}
+    SO_SNDBUF:        {sndbuf} bytes (requested: {requested(options['sndbuf'])})
+    SO_RCVBUF:        {rcvbuf} bytes (requested: {requested(options['rcvbuf'])})
+""")
+    
+    if options['loop'] != options['requested_loop'] and options['requested_loop'] != 'auto':
+        print(f"{Colors.WARNING}⚠️  {options['requested_loop']} is not installed, using {options['loop']}{Colors.ENDC}")
+    if options['http'] != options['requested_http'] and options['requested_http'] != 'auto':
+        print(f"{Colors.WARNING}⚠️  {options['requested_http']} is not installed, using {options['http']}{Colors.ENDC}")
+    if options['server'] != options['requested_server']:
+        print(f"{Colors.WARNING}⚠️  {options['requested_server']} is not installed, using {options['server']}{Colors.ENDC}")
+    if options['server'] == 'hypercorn' and options['limit_concurrency']:
+        print(f"{Colors.WARNING}⚠️  --limit-concurrency is not supported by hypercorn and is ignored{Colors.ENDC}")
+
+def run_hypercorn(config, loop):
+    """Serve backend.main:app over HTTP/2 with hypercorn"""
+    import asyncio
+    from hypercorn.asyncio import serve
+    from backend.main import app
+    
+    if loop == 'uvloop':
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    
+    asyncio.run(serve(app, config))
+
 def main():
     """Run the WL-Drop server"""
     
@@ -96,6 +171,20 @@ def main():
     parser.add_argument('-v', '--version', action='store_true', help='Show version')
     parser.add_argument('-p', '--port', type=int, default=settings.PORT, help='Port number')
     parser.add_argument('--host', type=str, default=settings.HOST, help='Host address')
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='default', help='Launch profile')
+    parser.add_argument('--loop', choices=['auto', 'uvloop', 'asyncio'], help='Event loop')
+    parser.add_argument('--http', choices=['auto', 'httptools', 'h11'], help='HTTP parser')
+    parser.add_argument('--backlog', type=int, help='Listen backlog')
+    parser.add_argument('--keep-alive', type=int, help='Keep-alive timeout (seconds)')
+    parser.add_argument('--h11-max-event-size', type=parse_size, help='h11 incomplete event size limit')
+    parser.add_argument('--sndbuf', type=parse_size, help='Socket send buffer size')
+    parser.add_argument('--rcvbuf', type=parse_size, help='Socket receive buffer size')
+    parser.add_argument('--limit-concurrency', type=int, help='Max concurrent connections')
+    parser.add_argument('--self-test', action='store_true', help='Print effective configuration')
+    parser.add_argument('--server', choices=['uvicorn', 'hypercorn'], help='ASGI server (hypercorn serves HTTP/2)')
+    parser.add_argument('--certfile', type=str, help='TLS certificate file')
+    parser.add_argument('--keyfile', type=str, help='TLS private key file')
+    parser.add_argument('--h2-max-streams', type=int, help='Max concurrent HTTP/2 streams per connection')
     
     args = parser.parse_args()
     
@@ -109,18 +198,52 @@ def main():
         print_version()
         sys.exit(0)
     
+    # Resolve launch profile (explicit flags win over the profile)
+    options = resolve_options(args.profile, {
+        'loop': args.loop,
+        'http': args.http,
+        'backlog': args.backlog,
+        'keep_alive': args.keep_alive,
+        'h11_max_event_size': args.h11_max_event_size,
+        'sndbuf': args.sndbuf,
+        'rcvbuf': args.rcvbuf,
+        'limit_concurrency': args.limit_concurrency,
+        'server': args.server,
+        'h2_max_streams': args.h2_max_streams,
+    })
+    
+    if bool(args.certfile) != bool(args.keyfile):
+        parser.error('--certfile and --keyfile must be given together')
+    if args.certfile and options['server'] != 'hypercorn':
+        parser.error('TLS (--certfile/--keyfile) is only supported with --server hypercorn')
+    
+    if args.self_test:
+        print_self_test(options)
+        sys.exit(0)
+    
+    # Bind before printing the banner, so a taken port fails cleanly
+    try:
+        sock = create_listen_socket(args.host, args.port, options)
+    except OSError as e:
+        print(f"{Colors.FAIL}❌ Cannot listen on {args.host}:{args.port}: {e.strerror or e}{Colors.ENDC}")
+        if e.errno == errno.EADDRINUSE:
+            print(f"{Colors.WARNING}   Another server is using this port - stop it or pick one with -p{Colors.ENDC}")
+        sys.exit(1)
+    
     # Get local IP for display
     local_ip = get_local_ip()
+    scheme = 'https' if args.certfile else 'http'
     
     # Print startup banner
     print_banner()
     print(f"""
 {Colors.BOLD}🌐 Server Information:{Colors.ENDC}
-    {Colors.OKGREEN}●{Colors.ENDC} Local:   {Colors.OKCYAN}http://localhost:{args.port}{Colors.ENDC}
-    {Colors.OKGREEN}●{Colors.ENDC} Network: {Colors.OKCYAN}http://{local_ip}:{args.port}{Colors.ENDC}
+    {Colors.OKGREEN}●{Colors.ENDC} Local:   {Colors.OKCYAN}{scheme}://localhost:{args.port}{Colors.ENDC}
+    {Colors.OKGREEN}●{Colors.ENDC} Network: {Colors.OKCYAN}{scheme}://{local_ip}:{args.port}{Colors.ENDC}
+    {Colors.OKGREEN}●{Colors.ENDC} Server:  {options['server']}{' (HTTP/2)' if options['server'] == 'hypercorn' else ''}
 
 {Colors.BOLD}📱 Share with other devices:{Colors.ENDC}
-    Connect to: {Colors.WARNING}http://{local_ip}:{args.port}{Colors.ENDC}
+    Connect to: {Colors.WARNING}{scheme}://{local_ip}:{args.port}{Colors.ENDC}
     
 {Colors.BOLD}💡 Tips:{Colors.ENDC}
     • Make sure devices are on the same WiFi network
@@ -140,15 +263,33 @@ def main():
 {Colors.OKCYAN}━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━{Colors.ENDC}
 """)
     
-    # Run the server
+    # Run the server on the pre-configured listening socket
     try:
-        uvicorn.run(
+        if options['server'] == 'hypercorn':
+            config = hypercorn_config(
+                options,
+                sock,
+                ws_ping_interval=settings.WS_PING_INTERVAL,
+                certfile=args.certfile,
+                keyfile=args.keyfile
+            )
+            run_hypercorn(config, options['loop'])
+            return
+        
+        # Imported late: --help, --version and --self-test never need it
+        import uvicorn
+        
+        config = uvicorn.Config(
             "backend.main:app",
             host=args.host,
             port=args.port,
             reload=False,
-            log_level="info"
+            log_level="info",
+            ws_ping_interval=settings.WS_PING_INTERVAL,
+            ws_ping_timeout=settings.WS_PING_TIMEOUT,
+            **uvicorn_kwargs(options)
         )
+        uvicorn.Server(config).run(sockets=[sock])
     except KeyboardInterrupt:
         print(f"\n\n{Colors.WARNING}Server stopped by user{Colors.ENDC}")
         print(f"{Colors.OKGREEN}Thank you for using WL-Drop!{Colors.ENDC}\n")
@@ -0,0 +1,183 @@
+"""
+HTTP/1.1 vs HTTP/2 benchmark for WL-Drop
+Uploads and then downloads a folder of small files, the workload where
+per-request latency dominates, against one or more running servers.
+
+    python run.py -p 8000                       # uvicorn, HTTP/1.1
+    python run.py -p 8001 --server hypercorn    # hypercorn, HTTP/2 (h2c)
+    python tools/http_bench.py --h1 http://127.0.0.1:8000 --h2 http://127.0.0.1:8001
+
+HTTP/1.1 runs use a pool of --connections connections (browsers use 6
+per host); HTTP/2 runs multiplex every request over a single connection.
+Requires httpx, plus h2 for the HTTP/2 runs (pip install "httpx[http2]").
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import List, Optional
+
+import httpx
+
+
+def percentiles(samples: List[float]) -> dict:
+    """p50/p90/p99/max of a list of latencies in ms"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(fraction: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 2)
+
+    return {
+        "count": len(ordered),
+        "p50": pick(0.50),
+        "p90": pick(0.90),
+        "p99": pick(0.99),
+        "max": round(ordered[-1], 2),
+    }
+
+
+def parse_size(value: str) -> int:
+    """Parse a byte size such as 4096, 4K or 1M"""
+    units = {"K": 1024, "M": 1024 ** 2}
+    value = value.strip().upper().rstrip("B")
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+async def _timed(semaphore: asyncio.Semaphore, latencies: List[float], request) -> httpx.Response:
+    async with semaphore:
+        started = time.perf_counter()
+        response = await request()
+        latencies.append((time.perf_counter() - started) * 1000)
+        response.raise_for_status()
+        return response
+
+
+async def run_phase(requests, concurrency: int) -> dict:
+    """Run request factories with bounded concurrency, timing each one"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(_timed(semaphore, latencies, request) for request in requests))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "seconds": round(elapsed, 3),
+        "requestsPerSec": round(len(latencies) / elapsed, 1),
+        "latencyMs": percentiles(latencies),
+        "httpVersions": sorted({response.http_version for response in responses}),
+    }
+
+
+async def bench_target(label: str, url: str, http2: bool, args) -> dict:
+    """Upload then download --files files of --size bytes through one server"""
+    api = url.rstrip("/") + "/api"
+    transfer_id = f"transfer_bench_{label}_{int(time.time() * 1000)}"
+    payload = os.urandom(args.size)
+    paths = [f"bench/dir{index % 10}/file{index}.bin" for index in range(args.files)]
+
+    if http2:
+        # One multiplexed connection (h2 prior knowledge for http:// URLs)
+        client = httpx.AsyncClient(http1=False, http2=True, timeout=60, verify=not args.insecure)
+    else:
+        limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+        client = httpx.AsyncClient(limits=limits, timeout=60, verify=not args.insecure)
+
+    async with client:
+        def upload(path: str):
+            return lambda: client.post(
+                f"{api}/files/upload",
+                data={
+                    "sender_id": "bench",
+                    "transfer_id": transfer_id,
+                    "relative_path": path,
+                    "file_size": str(args.size),
+                },
+                files={"file": (os.path.basename(path), payload, "application/octet-stream")},
+            )
+
+        def download(path: str):
+            return lambda: client.get(f"{api}/files/download/{transfer_id}/{path}")
+
+        uploads = await run_phase([upload(path) for path in paths], args.concurrency)
+        downloads = await run_phase([download(path) for path in paths], args.concurrency)
+
+        # Downloads normally clean up already - make sure nothing is left behind
+        await client.delete(f"{api}/transfers/{transfer_id}")
+
+    return {
+        "label": label,
+        "url": url,
+        "upload": uploads,
+        "download": downloads,
+    }
+
+
+def print_result(result: dict):
+    print(f"\n📊 {result['label']} ({result['url']})")
+    for phase in ("upload", "download"):
+        stats = result[phase]
+        latency = stats["latencyMs"]
+        print(f"   {phase:<9} {stats['seconds']:>7.2f}s  {stats['requestsPerSec']:>8.1f} req/s  "
+              f"p50={latency['p50']}ms p99={latency['p99']}ms  ({', '.join(stats['httpVersions'])})")
+
+
+def print_comparison(results: List[dict]):
+    baseline = results[0]
+    for result in results[1:]:
+        print(f"\n⚡ {result['label']} vs {baseline['label']}:")
+        for phase in ("upload", "download"):
+            speedup = baseline[phase]["seconds"] / max(result[phase]["seconds"], 1e-9)
+            print(f"   {phase:<9} {speedup:.2f}x")
+
+
+async def main_async(args) -> List[dict]:
+    targets = [("h1", url, False) for url in args.h1] + [("h2", url, True) for url in args.h2]
+
+    results = []
+    for label, url, http2 in targets:
+        for round_index in range(args.rounds):
+            name = label if args.rounds == 1 else f"{label}#{round_index + 1}"
+            print(f"🚀 {name}: {args.files} x {args.size} bytes against {url} ...")
+            result = await bench_target(name, url, http2, args)
+            print_result(result)
+            results.append(result)
+
+    return results
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="WL-Drop HTTP/1.1 vs HTTP/2 benchmark")
+    parser.add_argument("--h1", action="append", default=[], metavar="URL", help="Server to test over HTTP/1.1")
+    parser.add_argument("--h2", action="append", default=[], metavar="URL", help="Server to test over HTTP/2")
+    parser.add_argument("--files", type=int, default=500, help="Number of files")
+    parser.add_argument("--size", type=parse_size, default=4096, help="Size of each file (e.g. 4K)")
+    parser.add_argument("--concurrency", type=int, default=64, help="Requests in flight")
+    parser.add_argument("--connections", type=int, default=6, help="HTTP/1.1 connection pool size")
+    parser.add_argument("--rounds", type=int, default=1, help="Repeat each target")
+    parser.add_argument("--insecure", action="store_true", help="Skip TLS verification (self-signed certs)")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    if not args.h1 and not args.h2:
+        parser.error("give at least one --h1 or --h2 target")
+
+    results = asyncio.run(main_async(args))
+
+    if len(results) > 1:
+        print_comparison(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
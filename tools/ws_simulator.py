@@ -0,0 +1,455 @@
+"""
+WebSocket scale simulator for WL-Drop
+Opens N simulated devices against a running server and drives device
+churn (mode changes, disconnect/reconnect) and transfer handshakes, then
+reports broadcast latency, handshake latency, message rates and the
+server's CPU and memory.
+
+    python tools/ws_simulator.py --clients 500 --duration 60 --server-pid 1234
+
+Latencies are measured in this process, so they include the simulator's
+own scheduling delay - keep an eye on the reported simulator loop lag and
+run several simulators (with different --prefix) for very large counts.
+Each client holds a socket: raise `ulimit -n` on both sides first.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import websockets
+
+try:
+    import psutil
+except ImportError:  # Optional - /proc is used instead on Linux
+    psutil = None
+
+
+MODES = ("HOME", "SEND", "RECEIVE")
+DEVICE_TYPES = ("DESKTOP", "LAPTOP", "PHONE", "TABLET")
+CHANGE_TTL = 10.0  # Seconds a registry change is tracked for latency
+
+
+def percentiles(samples: List[float]) -> dict:
+    """p50/p90/p99/max of a list of latencies in ms"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(fraction: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 1)
+
+    return {
+        "count": len(ordered),
+        "p50": pick(0.50),
+        "p90": pick(0.90),
+        "p99": pick(0.99),
+        "max": round(ordered[-1], 1),
+    }
+
+
+class ProcessSampler:
+    """
+    CPU and memory of the server process
+    Uses psutil when installed, /proc/<pid> otherwise (Linux only)
+    """
+
+    def __init__(self, pid: Optional[int]):
+        self.pid = pid
+        self._process = psutil.Process(pid) if psutil and pid else None
+        self._last: Optional[Tuple[float, float]] = None
+        self._ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+        self.cpu_samples: List[float] = []
+        self.peak_rss = 0
+
+        if self._process is not None:
+            self._process.cpu_percent(None)  # Prime the counter
+
+    def _proc_cpu_seconds(self) -> float:
+        with open(f"/proc/{self.pid}/stat") as f:
+            # Fields after the command name, which may contain spaces
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / self._ticks
+
+    def _proc_rss(self) -> int:
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+    def sample(self) -> Optional[dict]:
+        """Current CPU % (since the previous sample) and RSS, None without a pid"""
+        if not self.pid:
+            return None
+
+        try:
+            if self._process is not None:
+                cpu = self._process.cpu_percent(None)
+                rss = self._process.memory_info().rss
+            else:
+                now = time.monotonic()
+                cpu_seconds = self._proc_cpu_seconds()
+                cpu = 0.0
+                if self._last is not None:
+                    cpu = (cpu_seconds - self._last[1]) / max(now - self._last[0], 1e-6) * 100
+                self._last = (now, cpu_seconds)
+                rss = self._proc_rss()
+        except (OSError, IndexError, ValueError) as e:
+            print(f"⚠️  Cannot sample server process {self.pid}: {e}")
+            self.pid = None
+            return None
+
+        self.cpu_samples.append(cpu)
+        self.peak_rss = max(self.peak_rss, rss)
+        return {"cpuPercent": round(cpu, 1), "rssMB": round(rss / 1024 / 1024, 1)}
+
+
+class Stats:
+    """Counters shared by every simulated client"""
+
+    def __init__(self):
+        self.sent = Counter()
+        self.received = Counter()
+        self.bytes_received = 0
+        self.broadcast_latency: List[float] = []
+        self.handshake_latency: List[float] = []
+        self.connect_latency: List[float] = []
+        self.errors = Counter()
+        self.loop_lag_max = 0.0
+
+    def window(self) -> Tuple[int, int]:
+        return sum(self.sent.values()), sum(self.received.values())
+
+
+class SimClient:
+    """One simulated device"""
+
+    def __init__(self, sim: "Simulator", client_id: str, index: int):
+        self.sim = sim
+        self.client_id = client_id
+        self.name = f"Sim {index}"
+        self.device_type = DEVICE_TYPES[index % len(DEVICE_TYPES)]
+        self.mode = random.choice(MODES)
+        self.ws = None
+        self.reader: Optional[asyncio.Task] = None
+
+        # Last change of every device this client has already observed
+        self.observed: Dict[str, int] = {}
+
+    @property
+    def connected(self) -> bool:
+        return self.reader is not None and not self.reader.done()
+
+    async def connect(self):
+        url = f"{self.sim.url}/ws/{self.client_id}"
+        if self.sim.batch:
+            url += "?batch=1"
+
+        started = time.perf_counter()
+        self.ws = await websockets.connect(url, max_size=None, ping_interval=None, open_timeout=30)
+        self.sim.stats.connect_latency.append((time.perf_counter() - started) * 1000)
+
+        # Changes made before this client joined are not its to measure
+        self.observed = {changed_id: seq for changed_id, (seq, _, _) in self.sim.changes.items()}
+
+        self.reader = asyncio.create_task(self._read_loop())
+        self.sim.expect_change(self.client_id, self.mode)
+        await self.send({
+            "type": "register",
+            "name": self.name,
+            "deviceType": self.device_type,
+            "mode": self.mode,
+            "avatarId": 0,
+        })
+
+    async def disconnect(self):
+        self.sim.expect_change(self.client_id, None)
+        if self.ws is not None:
+            await self.ws.close()
+        if self.reader is not None:
+            await asyncio.gather(self.reader, return_exceptions=True)
+        self.observed.clear()
+
+    async def send(self, message: dict):
+        await self.ws.send(json.dumps(message))
+        self.sim.stats.sent[message["type"]] += 1
+
+    async def set_mode(self, mode: str):
+        self.mode = mode
+        self.sim.expect_change(self.client_id, mode)
+        await self.send({"type": "update_mode", "mode": mode})
+
+    async def _read_loop(self):
+        try:
+            async for frame in self.ws:
+                self.sim.stats.bytes_received += len(frame)
+                message = json.loads(frame)
+                messages = message.get("messages", []) if message.get("type") == "batch" else [message]
+                for item in messages:
+                    await self._handle(item)
+        except websockets.ConnectionClosed:
+            pass
+        except Exception as e:
+            self.sim.stats.errors[type(e).__name__] += 1
+
+    async def _handle(self, message: dict):
+        msg_type = message.get("type")
+        self.sim.stats.received[msg_type] += 1
+
+        if msg_type == "device_list":
+            self.sim.observe_device_list(self, message.get("devices", []))
+
+        elif msg_type == "ping":
+            await self.send({"type": "pong", "ts": message.get("ts")})
+
+        elif msg_type == "transfer_request":
+            await self.send({"type": "accept_transfer", "senderId": message.get("from")})
+
+        elif msg_type == "transfer_accepted":
+            started = self.sim.handshakes.pop((self.client_id, message.get("from")), None)
+            if started is not None:
+                self.sim.stats.handshake_latency.append((time.perf_counter() - started) * 1000)
+
+
+class Simulator:
+    """Drives a fleet of simulated clients"""
+
+    def __init__(self, args):
+        self.url = args.url.rstrip("/")
+        self.batch = args.batch
+        self.args = args
+        self.stats = Stats()
+        self.sampler = ProcessSampler(args.server_pid)
+        self.clients = [
+            SimClient(self, f"{args.prefix}-{index}", index)
+            for index in range(args.clients)
+        ]
+
+        # Registry changes still propagating: {client_id: (seq, mode or None, started)}
+        self.changes: Dict[str, Tuple[int, Optional[str], float]] = {}
+        self._seq = 0
+
+        # Handshakes in flight: {(sender_id, receiver_id): started}
+        self.handshakes: Dict[Tuple[str, str], float] = {}
+
+    def expect_change(self, client_id: str, mode: Optional[str]):
+        """Record a registry change (mode None = device removed)"""
+        self._seq += 1
+        now = time.perf_counter()
+        self.changes[client_id] = (self._seq, mode, now)
+
+        # Stop tracking changes that every client has long since seen (or never will)
+        if self._seq % 100 == 0:
+            for changed_id in [
+                changed_id for changed_id, (_, _, started) in self.changes.items()
+                if now - started > CHANGE_TTL
+            ]:
+                del self.changes[changed_id]
+
+    def observe_device_list(self, client: SimClient, devices: List[dict]):
+        """Record broadcast latency for every change this device list reflects"""
+        now = time.perf_counter()
+        modes = {device.get("id"): device.get("mode") for device in devices}
+
+        for changed_id, (seq, mode, started) in self.changes.items():
+            if changed_id == client.client_id or client.observed.get(changed_id, 0) >= seq:
+                continue
+            if modes.get(changed_id) == mode:
+                client.observed[changed_id] = seq
+                self.stats.broadcast_latency.append((now - started) * 1000)
+
+    async def ramp_up(self):
+        """Connect every client, spread over --ramp seconds"""
+        delay = self.args.ramp / max(len(self.clients), 1)
+        for client in self.clients:
+            try:
+                await client.connect()
+            except Exception as e:
+                self.stats.errors[f"connect: {type(e).__name__}"] += 1
+            if delay:
+                await asyncio.sleep(delay)
+
+    async def churn(self, deadline: float):
+        """Mode changes and disconnect/reconnect cycles at --churn events/s"""
+        if self.args.churn <= 0:
+            return
+
+        while time.monotonic() < deadline:
+            await asyncio.sleep(random.expovariate(self.args.churn))
+            client = random.choice(self.clients)
+
+            try:
+                if not client.connected:
+                    await client.connect()
+                elif random.random() < self.args.disconnect_ratio:
+                    await client.disconnect()
+                else:
+                    await client.set_mode(random.choice([m for m in MODES if m != client.mode]))
+            except Exception as e:
+                self.stats.errors[f"churn: {type(e).__name__}"] += 1
+
+    async def handshakes_loop(self, deadline: float):
+        """send_request / accept_transfer round trips at --handshakes per second"""
+        if self.args.handshakes <= 0:
+            return
+
+        while time.monotonic() < deadline:
+            await asyncio.sleep(random.expovariate(self.args.handshakes))
+            connected = [client for client in self.clients if client.connected]
+            if len(connected) < 2:
+                continue
+
+            sender, receiver = random.sample(connected, 2)
+            self.handshakes[(sender.client_id, receiver.client_id)] = time.perf_counter()
+            try:
+                await sender.send({
+                    "type": "send_request",
+                    "targetId": receiver.client_id,
+                    "files": [{"name": "sim.bin", "size": 1024}],
+                })
+            except Exception as e:
+                self.stats.errors[f"handshake: {type(e).__name__}"] += 1
+
+    async def watch_loop_lag(self, deadline: float):
+        """Track this process's own scheduling delay"""
+        interval = 0.05
+        while time.monotonic() < deadline:
+            expected = time.monotonic() + interval
+            await asyncio.sleep(interval)
+            lag = (time.monotonic() - expected) * 1000
+            self.stats.loop_lag_max = max(self.stats.loop_lag_max, lag)
+
+    async def report_loop(self, deadline: float):
+        """Print a progress line every --interval seconds"""
+        last_sent, last_received = self.stats.window()
+        last_time = time.monotonic()
+
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.args.interval)
+            now = time.monotonic()
+            sent, received = self.stats.window()
+            elapsed = now - last_time
+
+            line = (
+                f"📊 clients={sum(c.connected for c in self.clients)} "
+                f"out={(sent - last_sent) / elapsed:.0f}/s in={(received - last_received) / elapsed:.0f}/s "
+                f"broadcast p99={percentiles(self.stats.broadcast_latency[-5000:]).get('p99', '-')}ms"
+            )
+            server = self.sampler.sample()
+            if server:
+                line += f" server cpu={server['cpuPercent']}% rss={server['rssMB']}MB"
+            print(line)
+
+            last_sent, last_received, last_time = sent, received, now
+
+    async def run(self) -> dict:
+        print(f"🚀 Connecting {len(self.clients)} clients to {self.url} ...")
+        started = time.monotonic()
+        await self.ramp_up()
+        print(f"✅ Ramp-up done in {time.monotonic() - started:.1f}s")
+
+        # Measure the steady state separately from the join storm
+        self.stats.broadcast_latency.clear()
+        self.sampler.sample()
+
+        measure_start = time.monotonic()
+        deadline = measure_start + self.args.duration
+        await asyncio.gather(
+            self.churn(deadline),
+            self.handshakes_loop(deadline),
+            self.watch_loop_lag(deadline),
+            self.report_loop(deadline),
+        )
+        elapsed = time.monotonic() - measure_start
+
+        # Let in-flight broadcasts land, then leave
+        await asyncio.sleep(1)
+        await asyncio.gather(
+            *(client.disconnect() for client in self.clients if client.connected),
+            return_exceptions=True
+        )
+
+        return self.summary(elapsed)
+
+    def summary(self, elapsed: float) -> dict:
+        sent, received = self.stats.window()
+        cpu = self.sampler.cpu_samples
+        return {
+            "clients": len(self.clients),
+            "durationSec": round(elapsed, 1),
+            "connectMs": percentiles(self.stats.connect_latency),
+            "broadcastLatencyMs": percentiles(self.stats.broadcast_latency),
+            "handshakeLatencyMs": percentiles(self.stats.handshake_latency),
+            "handshakesLost": len(self.handshakes),
+            "messagesSentPerSec": round(sent / elapsed, 1),
+            "messagesReceivedPerSec": round(received / elapsed, 1),
+            "bytesReceivedPerSec": round(self.stats.bytes_received / elapsed),
+            "receivedByType": dict(self.stats.received),
+            "server": {
+                "cpuAvgPercent": round(sum(cpu) / len(cpu), 1) if cpu else None,
+                "cpuMaxPercent": round(max(cpu), 1) if cpu else None,
+                "peakRssMB": round(self.sampler.peak_rss / 1024 / 1024, 1) if cpu else None,
+            },
+            "simulatorLoopLagMaxMs": round(self.stats.loop_lag_max, 1),
+            "errors": dict(self.stats.errors),
+        }
+
+
+def print_summary(summary: dict):
+    print("\n📋 Summary")
+    print(f"   Clients:            {summary['clients']} for {summary['durationSec']}s")
+    for label, key in (("Connect", "connectMs"), ("Broadcast latency", "broadcastLatencyMs"),
+                       ("Handshake latency", "handshakeLatencyMs")):
+        dist = summary[key]
+        if dist["count"]:
+            print(f"   {label + ':':<20}p50={dist['p50']}ms p90={dist['p90']}ms "
+                  f"p99={dist['p99']}ms max={dist['max']}ms (n={dist['count']})")
+    print(f"   Messages:           {summary['messagesSentPerSec']}/s out, "
+          f"{summary['messagesReceivedPerSec']}/s in, {summary['bytesReceivedPerSec'] / 1024:.0f} KB/s in")
+    server = summary["server"]
+    if server["cpuAvgPercent"] is not None:
+        print(f"   Server:             cpu avg={server['cpuAvgPercent']}% max={server['cpuMaxPercent']}% "
+              f"peak rss={server['peakRssMB']}MB")
+    print(f"   Simulator lag max:  {summary['simulatorLoopLagMaxMs']}ms")
+    if summary["errors"]:
+        print(f"   ⚠️  Errors: {summary['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WL-Drop WebSocket scale simulator")
+    parser.add_argument("--url", default="ws://127.0.0.1:8000", help="Server base URL")
+    parser.add_argument("--clients", type=int, default=100, help="Number of simulated devices")
+    parser.add_argument("--ramp", type=float, default=10.0, help="Seconds to spread connects over")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of churn to measure")
+    parser.add_argument("--churn", type=float, default=10.0, help="Registry changes per second")
+    parser.add_argument("--disconnect-ratio", type=float, default=0.2,
+                        help="Share of churn events that disconnect (or reconnect) a client")
+    parser.add_argument("--handshakes", type=float, default=2.0, help="Transfer handshakes per second")
+    parser.add_argument("--batch", action="store_true", help="Connect with ?batch=1")
+    parser.add_argument("--server-pid", type=int, help="Server PID for CPU/memory sampling")
+    parser.add_argument("--prefix", default="sim", help="Client ID prefix (unique per simulator)")
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between progress lines")
+    parser.add_argument("--seed", type=int, help="Random seed for a repeatable run")
+    parser.add_argument("--json", metavar="PATH", help="Also write the summary as JSON")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    summary = asyncio.run(Simulator(args).run())
+    print_summary(summary)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"💾 Summary written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -26,18 +26,49 @@ export const API_ENDPOINTS = {
   DOWNLOAD_TRANSFER: (transferId: string) => `${API_BASE_URL}/files/download/${transferId}`,
   DOWNLOAD_FILE: (transferId: string, filePath: string) => 
     `${API_BASE_URL}/files/download/${transferId}/${encodeURIComponent(filePath)}`,
+  SEGMENT: (transferId: string, filePath: string) =>
+    `${API_BASE_URL}/files/segment/${transferId}/${encodeURIComponent(filePath)}`,
+  NEGOTIATE: (clientId: string, direction: 'upload' | 'download' = 'download') =>
+    `${API_BASE_URL}/files/negotiate?client_id=${encodeURIComponent(clientId)}&direction=${direction}`,
   
   // Transfer endpoints
   INITIATE_TRANSFER: `${API_BASE_URL}/transfers/initiate`,
+  DIFF_TRANSFER: (transferId: string) => `${API_BASE_URL}/transfers/${transferId}/diff`,
   GET_TRANSFER: (transferId: string) => `${API_BASE_URL}/transfers/${transferId}`,
   ACCEPT_TRANSFER: (transferId: string) => `${API_BASE_URL}/transfers/${transferId}/accept`,
   REJECT_TRANSFER: (transferId: string) => `${API_BASE_URL}/transfers/${transferId}/reject`,
+  COMPLETE_TRANSFER: (transferId: string) => `${API_BASE_URL}/transfers/${transferId}/complete`,
   DELETE_TRANSFER: (transferId: string) => `${API_BASE_URL}/transfers/${transferId}`,
   
   // Health check
   HEALTH: `${API_BASE_URL}/health`,
 };
 
+export interface TransferTuning {
+  chunkSize: number;
+  parallelism: number;
+}
+
+/**
+ * Chunk size and number of parallel requests the server recommends for
+ * this client's link (one request at a time if negotiation fails)
+ */
+export const negotiateTransfer = async (
+  clientId: string,
+  direction: 'upload' | 'download'
+): Promise<TransferTuning> => {
+  try {
+    const response = await fetch(API_ENDPOINTS.NEGOTIATE(clientId, direction));
+    if (response.ok) {
+      const tuning = await response.json();
+      return { chunkSize: tuning.chunkSize, parallelism: Math.max(1, tuning.parallelism) };
+    }
+  } catch (error) {
+    console.warn('Transfer negotiation failed:', error);
+  }
+  return { chunkSize: 1024 * 1024, parallelism: 1 };
+};
+
 export const getWebSocketURL = (clientId: string) => {
   return `${WS_BASE_URL}/${clientId}`;
 };
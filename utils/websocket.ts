@@ -14,6 +14,11 @@ export type WSMessageType =
   | 'transfer_rejected'
   | 'transfer_progress'
   | 'transfer_complete'
+  | 'file_available'
+  | 'transfer_upload_complete'
+  | 'transfer_queued'
+  | 'transfer_started'
+  | 'transfer_cancelled'
   | 'ping'
   | 'pong';
 
@@ -57,6 +62,13 @@ export class WebSocketClient {
       this.ws.onmessage = (event) => {
         try {
           const message: WSMessage = JSON.parse(event.data);
+          
+          // Answer server liveness probes
+          if (message.type === 'ping') {
+            this.send({ type: 'pong', ts: message.ts });
+            return;
+          }
+          
           this.handleMessage(message);
         } catch (e) {
           console.error('Failed to parse WebSocket message:', e);
@@ -14,9 +14,13 @@ a = Analysis(
         'uvicorn.logging',
         'uvicorn.loops',
         'uvicorn.loops.auto',
+        'uvicorn.loops.asyncio',
+        'uvicorn.loops.uvloop',
         'uvicorn.protocols',
         'uvicorn.protocols.http',
         'uvicorn.protocols.http.auto',
+        'uvicorn.protocols.http.h11_impl',
+        'uvicorn.protocols.http.httptools_impl',
         'uvicorn.protocols.websockets',
         'uvicorn.protocols.websockets.auto',
         'uvicorn.lifespan',
@@ -38,11 +42,13 @@ a = Analysis(
         'pydantic_core',
         'aiofiles',
         'python_multipart',
+        'msgpack',
     ],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # Never used at runtime - keeps the archive small and extraction fast
+    excludes=['tkinter', 'test', 'unittest', 'lib2to3', 'idlelib', 'pydoc_data'],
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
@@ -61,7 +67,7 @@ exe = EXE(
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    upx=False,  # UPX-compressed binaries decompress on every launch
     upx_exclude=[],
     runtime_tmpdir=None,
     console=True,